@@ -3,26 +3,66 @@ FastAPI backend for COREP Regulatory Reporting Assistant.
 Provides REST API endpoints for the complete analysis pipeline.
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
 import os
-from pathlib import Path
+
+# One BLAS/OpenMP thread per worker process; must be set before numpy, faiss
+# or torch are imported (override via the environment)
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, Callable
+import asyncio
+import functools
+import io
+import logging
+import queue
+import faiss
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
 from rag.retriever import RAGRetriever
 from llm.reasoner import COREPReasoner
 from templates.mapper import COREPTemplateMapper
 from validation.rules import COREPValidator
-from audit.logger import AuditLogger
+from llm.exact_cache import ExactCache
+from llm.semantic_cache import SemanticCache
+from audit.logger import AuditLogger, wait_for_writes
+from config import (
+    API_MAX_CONCURRENT_REQUESTS,
+    EXACT_CACHE_CAPACITY,
+    EXCEL_ENGINE,
+    HNSW_EF_SEARCH,
+    IVF_NPROBE,
+    LLM_CACHE_DIR,
+    LLM_CACHE_TTL,
+    LLM_MAX_CONCURRENCY,
+    MAX_CONTEXT_TOKENS,
+    ONNX_MODEL_DIR,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES
+)
+
+
+class ORJSONResponse(Response):
+    """JSON response serialized with orjson."""
+    
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
 
 
 # Initialize FastAPI app
 app = FastAPI(
     title="COREP Regulatory Reporting Assistant",
     description="LLM-assisted regulatory reporting with RAG-based rule retrieval",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 
@@ -46,82 +86,209 @@ retriever: Optional[RAGRetriever] = None
 reasoner: Optional[COREPReasoner] = None
 mapper: Optional[COREPTemplateMapper] = None
 validator: Optional[COREPValidator] = None
+semantic_cache: Optional[SemanticCache] = None
+exact_cache = ExactCache(capacity=EXACT_CACHE_CAPACITY)
+
+log = logging.getLogger("corep.api")
+
+# Log records are queued on the request path and formatted/written by a
+# background listener thread (started at startup, stopped at shutdown)
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_log_handler = QueueHandler(_log_queue)
+_log_listener: Optional[QueueListener] = None
+
+
+def _start_logging() -> None:
+    """Route root logging through the queue and start the listener thread."""
+    global _log_listener
+    
+    if _log_listener is not None:
+        return
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    
+    _log_listener = QueueListener(_log_queue, stream_handler)
+    _log_listener.start()
+    
+    root_logger = logging.getLogger()
+    root_logger.addHandler(_log_handler)
+    root_logger.setLevel(logging.INFO)
+
+
+def _stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _log_listener
+    
+    if _log_listener is None:
+        return
+    
+    logging.getLogger().removeHandler(_log_handler)
+    _log_listener.stop()
+    _log_listener = None
+
+
+# Static response bodies
+_ROOT = {
+    "service": "COREP Regulatory Reporting Assistant",
+    "version": "1.0.0",
+    "status": "running",
+    "endpoints": {
+        "health": "/health",
+        "analyze": "/analyze",
+        "export": "/export/{session_id}"
+    }
+}
+
+_TEMPLATES = {
+    "templates": [
+        {
+            "code": "C01.00",
+            "name": "Own Funds",
+            "description": "Common Equity Tier 1, Additional Tier 1, and Tier 2 capital"
+        }
+    ]
+}
+
+
+def _build_health() -> Dict[str, Any]:
+    """Build the static part of the /health response from component state."""
+    components = {
+        "retriever": retriever is not None,
+        "reasoner": reasoner is not None,
+        "mapper": mapper is not None,
+        "validator": validator is not None
+    }
+    
+    return {
+        "status": "healthy" if all(components.values()) else "degraded",
+        "components": components
+    }
+
+
+# Recomputed once startup finishes; components don't change afterwards
+_health = _build_health()
+
+# Thread pool for blocking work (embedding, FAISS search, LLM calls, file IO)
+executor = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2)
+
+
+# Concurrency limits: LLM_SEM caps outbound LLM calls at the provider's rate
+# limit; REQ_SEM caps in-flight /analyze requests so overload is rejected
+# with 503 instead of queueing indefinitely
+LLM_SEM = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+REQ_SEM = asyncio.Semaphore(API_MAX_CONCURRENT_REQUESTS)
+
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """Run a blocking call in the thread pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize components on startup."""
-    global retriever, reasoner, mapper, validator
+    global retriever, reasoner, mapper, validator, semantic_cache, _health
     
-    print("Initializing COREP Assistant API...")
+    _start_logging()
+    log.info("Initializing COREP Assistant API...")
     
     try:
         # Initialize retriever
-        print("Loading RAG retriever...")
-        retriever = RAGRetriever(data_dir="data")
+        log.info("Loading RAG retriever...")
+        retriever = RAGRetriever(
+            data_dir="data",
+            ef_search=HNSW_EF_SEARCH,
+            nprobe=IVF_NPROBE,
+            onnx_dir=ONNX_MODEL_DIR
+        )
         
         # Initialize LLM reasoner
-        print("Loading LLM reasoner...")
-        reasoner = COREPReasoner()
+        log.info("Loading LLM reasoner...")
+        reasoner = COREPReasoner(cache_dir=LLM_CACHE_DIR, cache_ttl=LLM_CACHE_TTL)
         
         # Initialize mapper and validator
-        mapper = COREPTemplateMapper()
+        mapper = COREPTemplateMapper(engine=EXCEL_ENGINE)
         validator = COREPValidator()
         
-        print("✓ COREP Assistant API ready")
+        # Initialize semantic cache on the retriever's embedding model
+        semantic_cache = SemanticCache(
+            retriever.model,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            ttl=SEMANTIC_CACHE_TTL,
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES
+        )
+        
+        _health = _build_health()
+        
+        # Pin FAISS (and torch, if present) to the per-worker thread budget
+        num_threads = int(os.environ["OMP_NUM_THREADS"])
+        faiss.omp_set_num_threads(num_threads)
+        try:
+            import torch
+            torch.set_num_threads(num_threads)
+        except ImportError:
+            pass
+        
+        # Warm up the embedding model and FAISS index so the first request
+        # doesn't pay the cold-start cost
+        log.info("Warming up retriever...")
+        await run_blocking(retriever.retrieve, "own funds CET1", 1)
+        
+        log.info("✓ COREP Assistant API ready")
         
     except Exception as e:
-        print(f"Error during startup: {e}")
-        print("Make sure to run the embedding pipeline first:")
-        print("  python -m ingestion.embedder")
+        log.error("Error during startup: %s", e)
+        log.error("Make sure to run the embedding pipeline first:")
+        log.error("  python -m ingestion.embedder")
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the worker thread pool, finish audit log writes and stop the log listener."""
+    executor.shutdown(wait=False)
+    wait_for_writes()
+    _stop_logging()
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {
-        "service": "COREP Regulatory Reporting Assistant",
-        "version": "1.0.0",
-        "status": "running",
-        "endpoints": {
-            "health": "/health",
-            "analyze": "/analyze",
-            "export": "/export/{session_id}"
-        }
-    }
+    return _ROOT
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    components = {
-        "retriever": retriever is not None,
-        "reasoner": reasoner is not None,
-        "mapper": mapper is not None,
-        "validator": validator is not None
-    }
-    
-    all_ready = all(components.values())
-    
-    return {
-        "status": "healthy" if all_ready else "degraded",
-        "components": components,
-        "timestamp": datetime.now().isoformat()
-    }
+    return {**_health, "timestamp": datetime.now().isoformat()}
 
 
 @app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_scenario(request: AnalysisRequest):
+async def analyze_scenario(request: AnalysisRequest, background_tasks: BackgroundTasks):
     """
     Analyze a COREP scenario.
     
+    The audit log is written after the response is sent; the returned
+    audit_log_path is where it will appear.
+    
     Args:
         request: Analysis request with question and scenario
+        background_tasks: FastAPI background task queue
         
     Returns:
         Analysis response with results
     """
+    if REQ_SEM.locked():
+        raise HTTPException(status_code=503, detail="Server busy, please retry shortly")
+    
+    async with REQ_SEM:
+        return await _analyze(request, background_tasks)
+
+
+async def _analyze(request: AnalysisRequest, background_tasks: BackgroundTasks) -> AnalysisResponse:
+    """Run the analysis pipeline for a single request."""
     # Initialize audit logger
     logger = AuditLogger()
     
@@ -129,21 +296,69 @@ async def analyze_scenario(request: AnalysisRequest):
         # Log query
         logger.log_query(request.question, request.scenario)
         
-        # Step 1: Retrieve relevant rules
-        print(f"Retrieving relevant rules (top_k={request.top_k})...")
-        results = retriever.retrieve(request.question, top_k=request.top_k)
+        # Serve identical re-submissions from the exact-match cache
+        cache_key = ExactCache.make_key(
+            request.question, request.scenario, request.top_k, reasoner.model_name
+        )
+        cached = exact_cache.get(cache_key)
+        
+        if cached:
+            log.info("Exact cache hit")
+            logger.log_cache_hit("exact")
+            audit_log_path = logger.get_log_path()
+            background_tasks.add_task(logger.save_log)
+            
+            return AnalysisResponse(
+                success=True,
+                analysis=cached["analysis"],
+                validation=cached["validation"],
+                audit_log_path=audit_log_path
+            )
+        
+        # Embed the retrieval query and the semantic-cache text in one
+        # forward pass; both vectors land in the retriever's embedding memo
+        question_vec, query_vec = await run_blocking(
+            retriever.embed_batch,
+            [request.question, SemanticCache.cache_text(request.question, request.scenario)]
+        )
+        
+        # Look up the semantic cache and retrieve rules concurrently; a hit
+        # must also agree on amounts and top_k. The retrieval is speculative
+        # and stays memoized by the retriever if the cache hits
+        fingerprint = SemanticCache.fingerprint(request.question, request.scenario, request.top_k)
+        log.info("Retrieving relevant rules (top_k=%d)...", request.top_k)
+        cached, results = await asyncio.gather(
+            run_blocking(semantic_cache.get, query_vec, fingerprint),
+            run_blocking(retriever.retrieve_with_vec, question_vec, request.top_k, request.question)
+        )
+        
+        if cached:
+            log.info("Semantic cache hit (similarity=%.4f)", cached["similarity"])
+            logger.log_cache_hit("semantic", cached["similarity"])
+            audit_log_path = logger.get_log_path()
+            background_tasks.add_task(logger.save_log)
+            
+            return AnalysisResponse(
+                success=True,
+                analysis=cached["analysis"],
+                validation=cached["validation"],
+                audit_log_path=audit_log_path
+            )
+        
+        # Step 1: Log retrieved rules
         logger.log_retrieval(request.question, results, request.top_k)
         
         # Format for LLM
-        formatted_rules = retriever.format_for_llm(results)
+        formatted_rules = retriever.format_for_llm(results, max_tokens=MAX_CONTEXT_TOKENS)
         
         # Step 2: LLM reasoning
-        print("Performing LLM analysis...")
-        analysis = reasoner.analyze_scenario(
-            question=request.question,
-            scenario=request.scenario,
-            retrieved_rules=formatted_rules
-        )
+        log.info("Performing LLM analysis...")
+        async with LLM_SEM:
+            analysis = await reasoner.analyze_scenario_async(
+                question=request.question,
+                scenario=request.scenario,
+                retrieved_rules=formatted_rules
+            )
         
         logger.log_llm_call(
             prompt=f"Question: {request.question}",
@@ -153,8 +368,8 @@ async def analyze_scenario(request: AnalysisRequest):
         )
         
         # Step 3: Validate
-        print("Validating results...")
-        validation_result = validator.validate_analysis(analysis)
+        log.info("Validating results...")
+        validation_result = await run_blocking(validator.validate_analysis, analysis)
         logger.log_validation(validation_result)
         
         # Step 4: Template mapping
@@ -162,24 +377,29 @@ async def analyze_scenario(request: AnalysisRequest):
         fields_count = len(analysis.get("fields", []))
         logger.log_template_mapping(template_code, fields_count)
         
-        # Save audit log
-        audit_log_path = logger.save_log()
+        validation = {
+            "summary": validation_result.get_summary(),
+            "messages": validation_result.get_all_messages()
+        }
+        exact_cache.put(cache_key, analysis, validation)
+        semantic_cache.put(query_vec, analysis, validation, prompt=request.question, fingerprint=fingerprint)
+        
+        # Save audit log off the request path
+        audit_log_path = logger.get_log_path()
+        background_tasks.add_task(logger.save_log)
         
         return AnalysisResponse(
             success=True,
             analysis=analysis,
-            validation={
-                "summary": validation_result.get_summary(),
-                "messages": validation_result.get_all_messages()
-            },
+            validation=validation,
             audit_log_path=audit_log_path
         )
         
     except Exception as e:
         error_msg = str(e)
-        print(f"Error during analysis: {error_msg}")
+        log.error("Error during analysis: %s", error_msg)
         logger.log_error("ANALYSIS_ERROR", error_msg)
-        logger.save_log()
+        await run_blocking(logger.save_log)
         
         raise HTTPException(status_code=500, detail=error_msg)
 
@@ -199,16 +419,15 @@ async def export_to_excel(analysis: Dict[str, Any]):
         # Generate filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"corep_report_{timestamp}.xlsx"
-        output_path = Path("exports") / filename
-        output_path.parent.mkdir(exist_ok=True)
         
-        # Export to Excel
-        mapper.export_to_excel(analysis, str(output_path))
+        # Export to Excel in memory
+        buffer = io.BytesIO()
+        await run_blocking(mapper.export_to_excel, analysis, buffer)
         
-        return FileResponse(
-            path=str(output_path),
-            filename=filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        return StreamingResponse(
+            iter([buffer.getvalue()]),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
         
     except Exception as e:
@@ -218,15 +437,7 @@ async def export_to_excel(analysis: Dict[str, Any]):
 @app.get("/templates")
 async def list_templates():
     """List available COREP templates."""
-    return {
-        "templates": [
-            {
-                "code": "C01.00",
-                "name": "Own Funds",
-                "description": "Common Equity Tier 1, Additional Tier 1, and Tier 2 capital"
-            }
-        ]
-    }
+    return _TEMPLATES
 
 
 if __name__ == "__main__":
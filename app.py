@@ -7,13 +7,33 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+import io
 import json
+import orjson
 
 from rag.retriever import RAGRetriever
 from llm.reasoner import COREPReasoner
 from templates.mapper import COREPTemplateMapper
 from validation.rules import COREPValidator
+from llm.exact_cache import ExactCache
+from llm.semantic_cache import SemanticCache
 from audit.logger import AuditLogger
+from config import (
+    DATA_DIR,
+    GEMINI_MODEL,
+    GEMINI_TEMPERATURE,
+    EXACT_CACHE_CAPACITY,
+    EXCEL_ENGINE,
+    HNSW_EF_SEARCH,
+    IVF_NPROBE,
+    LLM_CACHE_DIR,
+    LLM_CACHE_TTL,
+    MAX_CONTEXT_TOKENS,
+    ONNX_MODEL_DIR,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES
+)
 
 
 # Page configuration
@@ -26,7 +46,10 @@ st.set_page_config(
 
 
 # Custom CSS
-st.markdown("""
+@st.cache_data(show_spinner=False)
+def _css() -> str:
+    """Build the custom stylesheet once per process."""
+    return """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -43,36 +66,11 @@ st.markdown("""
         border-bottom: 2px solid #1f77b4;
         padding-bottom: 0.5rem;
     }
-    .info-box {
-        background-color: #f0f8ff;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #1f77b4;
-        margin: 1rem 0;
-    }
-    .success-box {
-        background-color: #f0fff0;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #28a745;
-        margin: 1rem 0;
-    }
-    .warning-box {
-        background-color: #fff8e1;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #ffc107;
-        margin: 1rem 0;
-    }
-    .error-box {
-        background-color: #fff0f0;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #dc3545;
-        margin: 1rem 0;
-    }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+st.markdown(_css(), unsafe_allow_html=True)
 
 
 # Initialize session state
@@ -84,18 +82,87 @@ if 'audit_logger' not in st.session_state:
     st.session_state.audit_logger = None
 
 
+class LazyComponent:
+    """Proxy that builds a heavy component on first attribute access."""
+    
+    def __init__(self, factory, *args):
+        self._factory = factory
+        self._args = args
+    
+    def __getattr__(self, name):
+        return getattr(self._factory(*self._args), name)
+
+
+# Heavy components are process-wide singletons keyed on their configuration.
+# st.cache_resource survives script reruns, is shared across sessions and
+# serializes concurrent construction of the same key.
+@st.cache_resource(show_spinner="Loading regulatory index...")
+def get_retriever(data_dir: str) -> RAGRetriever:
+    """Load the FAISS index and embedding model."""
+    return RAGRetriever(
+        data_dir=data_dir,
+        ef_search=HNSW_EF_SEARCH,
+        nprobe=IVF_NPROBE,
+        onnx_dir=ONNX_MODEL_DIR
+    )
+
+
+@st.cache_resource(show_spinner="Connecting to Gemini...")
+def get_reasoner(model: str, temperature: float) -> COREPReasoner:
+    """Create the LLM reasoner."""
+    return COREPReasoner(
+        model=model,
+        temperature=temperature,
+        cache_dir=LLM_CACHE_DIR,
+        cache_ttl=LLM_CACHE_TTL
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache(data_dir: str) -> SemanticCache:
+    """Create the semantic cache on the retriever's embedding model."""
+    return SemanticCache(
+        get_retriever(data_dir).model,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl=SEMANTIC_CACHE_TTL,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES
+    )
+
+
 @st.cache_resource
 def load_components():
-    """Load and cache components."""
+    """Load and cache components; retriever and reasoner are built on first use."""
     try:
-        retriever = RAGRetriever(data_dir="data")
-        reasoner = COREPReasoner()
-        mapper = COREPTemplateMapper()
+        retriever = LazyComponent(get_retriever, str(DATA_DIR))
+        reasoner = LazyComponent(get_reasoner, GEMINI_MODEL, GEMINI_TEMPERATURE)
+        mapper = COREPTemplateMapper(engine=EXCEL_ENGINE)
         validator = COREPValidator()
+        exact_cache = ExactCache(capacity=EXACT_CACHE_CAPACITY)
+        semantic_cache = LazyComponent(get_semantic_cache, str(DATA_DIR))
         
-        return retriever, reasoner, mapper, validator, None
+        return retriever, reasoner, mapper, validator, exact_cache, semantic_cache, None
     except Exception as e:
-        return None, None, None, None, str(e)
+        return None, None, None, None, None, None, str(e)
+
+
+# Display tables are memoized on the serialized analysis so widget-triggered
+# reruns don't rebuild them; the mapper arg is skipped when hashing (leading _)
+@st.cache_data(show_spinner=False)
+def _detail_df(_mapper: COREPTemplateMapper, analysis_json: str) -> pd.DataFrame:
+    """Build the detailed field breakdown for an analysis."""
+    return _mapper.create_detailed_table(json.loads(analysis_json))
+
+
+@st.cache_data(show_spinner=False)
+def _template_df(_mapper: COREPTemplateMapper, analysis_json: str) -> pd.DataFrame:
+    """Build the C01.00 template view with amounts pre-formatted for display."""
+    df = _mapper.create_dataframe_from_analysis(json.loads(analysis_json))
+    return df.map(lambda x: f"{x:,.0f}")
+
+
+def _join_messages(messages) -> str:
+    """Render validation messages as a single markdown list."""
+    return "\n".join(f"- **{m['rule']}**: {m['message']}" for m in messages)
 
 
 def main():
@@ -110,7 +177,7 @@ def main():
     """)
     
     # Load components
-    retriever, reasoner, mapper, validator, error = load_components()
+    retriever, reasoner, mapper, validator, exact_cache, semantic_cache, error = load_components()
     
     if error:
         st.error(f"""
@@ -237,44 +304,76 @@ Please classify these items according to CRR requirements."""
                 # Log query
                 logger.log_query(question, scenario)
                 
-                # Step 1: Retrieve rules
-                st.write("**Step 1:** Retrieving relevant regulatory rules...")
-                results = retriever.retrieve(question, top_k=top_k)
-                logger.log_retrieval(question, results, top_k)
-                
-                formatted_rules = retriever.format_for_llm(results)
-                
-                # Step 2: LLM reasoning
-                st.write("**Step 2:** Performing LLM analysis...")
-                analysis = reasoner.analyze_scenario(
-                    question=question,
-                    scenario=scenario,
-                    retrieved_rules=formatted_rules
-                )
-                
-                logger.log_llm_call(
-                    prompt=question,
-                    response=analysis,
-                    model=analysis.get("metadata", {}).get("model", "unknown"),
-                    tokens_used=analysis.get("metadata", {}).get("tokens_used")
-                )
-                
-                # Step 3: Validate
-                st.write("**Step 3:** Validating results...")
-                validation_result = validator.validate_analysis(analysis)
-                logger.log_validation(validation_result)
+                # Serve identical re-submissions from the exact-match cache,
+                # then near-duplicate queries from the semantic cache
+                cache_key = ExactCache.make_key(question, scenario, top_k, reasoner.model_name)
+                fingerprint = SemanticCache.fingerprint(question, scenario, top_k)
+                query_vec = None
+                cached = exact_cache.get(cache_key)
                 
-                # Step 4: Template mapping
-                template_code = analysis.get("template", "C01.00")
-                fields_count = len(analysis.get("fields", []))
-                logger.log_template_mapping(template_code, fields_count)
+                if cached:
+                    logger.log_cache_hit("exact")
+                else:
+                    query_vec = semantic_cache.embed(question, scenario)
+                    cached = semantic_cache.get(query_vec, fingerprint)
+                    if cached:
+                        logger.log_cache_hit("semantic", cached["similarity"])
                 
-                # Save results
-                st.session_state.analysis_result = analysis
-                st.session_state.validation_result = validation_result
-                st.session_state.retrieved_results = results
-                
-                st.success("✅ Analysis completed successfully!")
+                if cached:
+                    st.session_state.analysis_result = cached["analysis"]
+                    st.session_state.validation_result = cached["validation"]
+                    st.session_state.retrieved_results = cached["retrieved"]
+                    
+                    st.success("✅ Served from cache")
+                else:
+                    # Step 1: Retrieve rules
+                    st.write("**Step 1:** Retrieving relevant regulatory rules...")
+                    results = retriever.retrieve(question, top_k=top_k)
+                    logger.log_retrieval(question, results, top_k)
+                    
+                    formatted_rules = retriever.format_for_llm(results, max_tokens=MAX_CONTEXT_TOKENS)
+                    
+                    # Step 2: LLM reasoning
+                    st.write("**Step 2:** Performing LLM analysis...")
+                    analysis = reasoner.analyze_scenario(
+                        question=question,
+                        scenario=scenario,
+                        retrieved_rules=formatted_rules
+                    )
+                    
+                    logger.log_llm_call(
+                        prompt=question,
+                        response=analysis,
+                        model=analysis.get("metadata", {}).get("model", "unknown"),
+                        tokens_used=analysis.get("metadata", {}).get("tokens_used")
+                    )
+                    
+                    # Step 3: Validate
+                    st.write("**Step 3:** Validating results...")
+                    validation_result = validator.validate_analysis(analysis)
+                    logger.log_validation(validation_result)
+                    
+                    # Step 4: Template mapping
+                    template_code = analysis.get("template", "C01.00")
+                    fields_count = len(analysis.get("fields", []))
+                    logger.log_template_mapping(template_code, fields_count)
+                    
+                    # Save results
+                    st.session_state.analysis_result = analysis
+                    st.session_state.validation_result = validation_result
+                    st.session_state.retrieved_results = results
+                    
+                    exact_cache.put(cache_key, analysis, validation_result, retrieved=results)
+                    semantic_cache.put(
+                        query_vec,
+                        analysis,
+                        validation_result,
+                        prompt=question,
+                        retrieved=results,
+                        fingerprint=fingerprint
+                    )
+                    
+                    st.success("✅ Analysis completed successfully!")
                 
             except Exception as e:
                 st.error(f"❌ Error during analysis: {str(e)}")
@@ -288,6 +387,7 @@ Please classify these items according to CRR requirements."""
         
         analysis = st.session_state.analysis_result
         validation_result = st.session_state.validation_result
+        analysis_json = json.dumps(analysis, sort_keys=True)
         
         # Validation summary
         summary = validation_result.get_summary()
@@ -309,7 +409,7 @@ Please classify these items according to CRR requirements."""
         
         with tab1:
             st.markdown("#### Detailed Field Breakdown")
-            df_details = mapper.create_detailed_table(analysis)
+            df_details = _detail_df(mapper, analysis_json)
             
             # Format for display
             if not df_details.empty:
@@ -323,41 +423,30 @@ Please classify these items according to CRR requirements."""
         
         with tab2:
             st.markdown("#### COREP Template Format")
-            df_template = mapper.create_dataframe_from_analysis(analysis)
+            df_template = _template_df(mapper, analysis_json)
             
-            # Format values as currency
-            st.dataframe(
-                df_template.style.format("{:,.0f}"),
-                use_container_width=True
-            )
+            st.dataframe(df_template, use_container_width=True)
         
         with tab3:
             st.markdown("#### Validation Results")
             
             if validation_result.is_valid():
-                st.markdown('<div class="success-box">✅ All validations passed!</div>', 
-                           unsafe_allow_html=True)
+                st.success("✅ All validations passed!")
             else:
-                st.markdown('<div class="error-box">❌ Validation failed - review errors below</div>', 
-                           unsafe_allow_html=True)
+                st.error("❌ Validation failed - review errors below")
             
-            # Show errors
+            # One box per severity instead of one per message
             if validation_result.errors:
                 st.markdown("**🔴 Errors:**")
-                for err in validation_result.errors:
-                    st.error(f"**{err['rule']}**: {err['message']}")
+                st.error(_join_messages(validation_result.errors))
             
-            # Show warnings
             if validation_result.warnings:
                 st.markdown("**🟡 Warnings:**")
-                for warn in validation_result.warnings:
-                    st.warning(f"**{warn['rule']}**: {warn['message']}")
+                st.warning(_join_messages(validation_result.warnings))
             
-            # Show info
             if validation_result.info:
                 st.markdown("**ℹ️ Information:**")
-                for info in validation_result.info:
-                    st.info(f"**{info['rule']}**: {info['message']}")
+                st.info(_join_messages(validation_result.info))
         
         with tab4:
             st.markdown("#### Retrieved Regulatory Rules")
@@ -400,22 +489,20 @@ Please classify these items according to CRR requirements."""
                 try:
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     filename = f"corep_report_{timestamp}.xlsx"
-                    output_path = Path("exports") / filename
-                    output_path.parent.mkdir(exist_ok=True)
                     
-                    path = mapper.export_to_excel(analysis, str(output_path))
+                    buffer = io.BytesIO()
+                    mapper.export_to_excel(analysis, buffer)
                     
                     if st.session_state.audit_logger:
-                        st.session_state.audit_logger.log_export(str(path), "xlsx")
+                        st.session_state.audit_logger.log_export(filename, "xlsx")
                     
-                    with open(path, "rb") as f:
-                        st.download_button(
-                            label="📥 Download File",
-                            data=f,
-                            file_name=filename,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            use_container_width=True
-                        )
+                    st.download_button(
+                        label="📥 Download File",
+                        data=buffer.getvalue(),
+                        file_name=filename,
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        use_container_width=True
+                    )
                     
                     st.success(f"✅ Excel file created: {filename}")
                     
@@ -427,7 +514,7 @@ Please classify these items according to CRR requirements."""
             if st.button("📄 Download Audit Log", use_container_width=True):
                 if st.session_state.audit_logger:
                     try:
-                        log_path = st.session_state.audit_logger.save_log()
+                        log_path = st.session_state.audit_logger.save_log(wait=True)
                         
                         with open(log_path, "r") as f:
                             st.download_button(
@@ -446,10 +533,10 @@ Please classify these items according to CRR requirements."""
         with col3:
             # Export JSON
             if st.button("📋 Download Analysis JSON", use_container_width=True):
-                json_str = json.dumps(analysis, indent=2)
+                json_bytes = orjson.dumps(analysis, option=orjson.OPT_INDENT_2)
                 st.download_button(
                     label="📥 Download JSON",
-                    data=json_str,
+                    data=json_bytes,
                     file_name=f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                     mime="application/json",
                     use_container_width=True
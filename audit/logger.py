@@ -3,35 +3,333 @@ Audit logger for COREP regulatory reporting assistant.
 Tracks all processing steps, decisions, and data sources.
 """
 
+import atexit
 import json
+import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import uuid
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4f
+except ImportError:
+    lz4f = None
+
+
+log = logging.getLogger(__name__)
+
+
+def _json_default(obj: Any) -> Any:
+    """Fallback for values neither serializer handles natively."""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+
+def _dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Serialize to UTF-8 JSON bytes, with orjson when available.
+    
+    Args:
+        obj: Object to serialize
+        pretty: Indent with two spaces
+        
+    Returns:
+        JSON bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option, default=_json_default)
+    
+    return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+# fdatasync skips the metadata flush where available (not on Windows)
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+class _LogWriter:
+    """Daemon thread that writes queued audit log payloads off the caller's thread."""
+    
+    def __init__(self, maxsize: int = 8):
+        """
+        Start the writer thread.
+        
+        Args:
+            maxsize: Saves that may be queued before save_log() blocks
+        """
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._writer_loop, name="audit-log-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, path: Path, payload: bytes) -> None:
+        """Queue a full-file payload for writing."""
+        self._queue.put((path, payload))
+    
+    def join(self) -> None:
+        """Block until every queued payload has been written."""
+        self._queue.join()
+    
+    def _writer_loop(self) -> None:
+        """Drain the queue in batches, writing each file once per batch."""
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # A failed write must neither kill the thread nor skip task_done(),
+            # or wait_for_writes() would block forever
+            try:
+                # Each payload is a full snapshot, so only the latest per path is written
+                latest = {}
+                for path, payload in batch:
+                    latest[path] = payload
+                
+                for path, payload in latest.items():
+                    try:
+                        self._write_file(path, payload)
+                    except Exception as e:
+                        log.warning("Could not write audit log %s: %s", path, e)
+            except Exception as e:
+                log.warning("Could not write audit log batch: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    @staticmethod
+    def _write_file(path: Path, payload: bytes) -> None:
+        """Write payload to path and sync it to disk once."""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            _fdatasync(fd)
+        finally:
+            os.close(fd)
+
+
+_writer: Optional[_LogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _LogWriter:
+    """
+    Return the process-wide log writer, starting it on first use.
+    
+    The writer is a daemon thread, so queued saves are drained at
+    interpreter exit (Streamlit, scripts) rather than dropped.
+    """
+    global _writer
+    
+    with _writer_lock:
+        if _writer is None:
+            _writer = _LogWriter()
+            atexit.register(wait_for_writes)
+        return _writer
+
+
+def wait_for_writes() -> None:
+    """Block until all queued audit log saves have reached disk."""
+    if _writer is not None:
+        _writer.join()
+
+
+# get_formatted_trail() detail lines, one formatter per event type
+def _fmt_query(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Question: {d['question']}")
+    lines.append(f"   Scenario: {d['scenario'][:100]}...")
+
+
+def _fmt_retrieval(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Query: {d['query']}")
+    lines.append(f"   Results: {d['results_count']} chunks retrieved")
+
+
+def _fmt_llm(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Model: {d['model']}")
+    lines.append(f"   Tokens: {d.get('tokens_used', 'N/A')}")
+
+
+def _fmt_cache_hit(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Cache: {d['cache_type']}")
+    lines.append(f"   Similarity: {d.get('similarity', 'N/A')}")
+
+
+def _fmt_validation(lines: List[str], d: Dict) -> None:
+    summary = d['summary']
+    lines.append(f"   Valid: {summary['is_valid']}")
+    lines.append(f"   Errors: {summary['errors']}, Warnings: {summary['warnings']}")
+
+
+def _fmt_mapping(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Template: {d['template_code']}")
+    lines.append(f"   Fields: {d['fields_count']}")
+
+
+def _fmt_export(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Path: {d['output_path']}")
+
+
+def _fmt_error(lines: List[str], d: Dict) -> None:
+    lines.append(f"   Error: {d['message']}")
+
 
 class AuditLogger:
     """Logs audit trail for regulatory reporting."""
     
-    def __init__(self, log_dir: str = "audit_logs"):
+    _FORMATTERS = {
+        "USER_QUERY": _fmt_query,
+        "DOCUMENT_RETRIEVAL": _fmt_retrieval,
+        "LLM_REASONING": _fmt_llm,
+        "CACHE_HIT": _fmt_cache_hit,
+        "VALIDATION": _fmt_validation,
+        "TEMPLATE_MAPPING": _fmt_mapping,
+        "FILE_EXPORT": _fmt_export,
+        "ERROR": _fmt_error
+    }
+    
+    def __init__(self,
+                 log_dir: str = "audit_logs",
+                 flush_size: int = 128,
+                 flush_interval: Optional[float] = None):
         """
         Initialize audit logger.
         
+        Events are buffered and flushed in batches into the trail;
+        save_log() writes the aggregate JSON.
+        
         Args:
             log_dir: Directory to store audit logs
+            flush_size: Number of buffered events that triggers a flush
+            flush_interval: Optional seconds between background flushes
         """
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
         
         # Initialize new session
         self.session_id = str(uuid.uuid4())
-        self.session_start = datetime.now().isoformat()
+        self._start_ns = self._now()
+        self.session_start = self._format_ts(self._start_ns)
         
         self.audit_trail = {
             "session_id": self.session_id,
             "session_start": self.session_start,
             "events": []
         }
+        
+        self._default_filename = None
+        
+        # Retrieved chunks are stored once per session and referenced by id
+        self.chunk_table: List[Dict] = []
+        self._chunk_ids: Dict[tuple, int] = {}
+        
+        # Buffered events awaiting flush
+        self._pending: List[Dict] = []
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+        
+        if flush_interval:
+            self._schedule_flush()
+    
+    @staticmethod
+    def _now() -> int:
+        """Current time as integer nanoseconds since the epoch."""
+        return time.time_ns()
+    
+    @staticmethod
+    def _format_ts(ts_ns: int) -> str:
+        """Format a nanosecond timestamp as a local ISO 8601 string."""
+        return datetime.fromtimestamp(ts_ns / 1e9).isoformat()
+    
+    @classmethod
+    def _export_event(cls, event: Dict) -> Dict:
+        """Event as saved to disk: ISO timestamp added alongside ts_ns."""
+        return {"timestamp": cls._format_ts(event["ts_ns"]), **event}
+    
+    def _new_event(self, event_type: str, data: Dict) -> None:
+        """
+        Build an event around its data payload and record it.
+        
+        Args:
+            event_type: Event type name
+            data: Event payload (retained as-is in the trail)
+        """
+        self._record({"ts_ns": self._now(), "event_type": event_type, "data": data})
+    
+    def _record(self, event: Dict) -> None:
+        """Buffer an event, flushing once the buffer is full."""
+        # Same lock as _flush(), so an append can't land in a list being swapped out
+        with self._flush_lock:
+            self._pending.append(event)
+            full = len(self._pending) >= self._flush_size
+        
+        if full:
+            self._flush()
+    
+    def _flush(self) -> None:
+        """Move buffered events into the trail."""
+        with self._flush_lock:
+            if not self._pending:
+                return
+            
+            events, self._pending = self._pending, []
+            self.audit_trail["events"].extend(events)
+    
+    def _schedule_flush(self) -> None:
+        """Flush on a background timer every flush_interval seconds."""
+        def tick():
+            if self._closed:
+                return
+            self._flush()
+            self._schedule_flush()
+        
+        # Checked under the lock close() sets _closed with, so a tick that was
+        # already running when close() cancelled it can't start a new timer
+        with self._flush_lock:
+            if self._closed:
+                return
+            self._timer = threading.Timer(self._flush_interval, tick)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def close(self) -> None:
+        """Stop the background flush timer and flush remaining events."""
+        with self._flush_lock:
+            self._closed = True
+            timer, self._timer = self._timer, None
+        
+        if timer is not None:
+            timer.cancel()
+        self._flush()
+    
+    def flush_and_close(self) -> None:
+        """Close the logger and wait for queued log saves to be written."""
+        self.close()
+        wait_for_writes()
     
     def log_query(self, question: str, scenario: str):
         """
@@ -41,15 +339,10 @@ class AuditLogger:
             question: User question
             scenario: Scenario description
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "USER_QUERY",
-            "data": {
-                "question": question,
-                "scenario": scenario
-            }
-        }
-        self.audit_trail["events"].append(event)
+        self._new_event("USER_QUERY", {
+            "question": question,
+            "scenario": scenario
+        })
     
     def log_retrieval(self, query: str, results: List[Dict], top_k: int):
         """
@@ -60,27 +353,47 @@ class AuditLogger:
             results: Retrieved chunks
             top_k: Number of results requested
         """
-        # Simplified results for logging
-        simplified_results = []
-        for r in results:
-            simplified_results.append({
-                "source_file": r["metadata"]["source_file"],
-                "page": r["metadata"]["page"],
-                "similarity_score": r.get("similarity_score"),
-                "text_preview": r["text"][:200] if len(r["text"]) > 200 else r["text"]
+        # Simplified results for logging; chunk payloads live in chunk_table
+        simplified_results = [
+            {"chunk": self._intern_chunk(r), "similarity_score": r.get("similarity_score")}
+            for r in results
+        ]
+        
+        self._new_event("DOCUMENT_RETRIEVAL", {
+            "query": query,
+            "top_k": top_k,
+            "results_count": len(results),
+            "results": simplified_results
+        })
+    
+    def _intern_chunk(self, result: Dict) -> int:
+        """
+        Add a retrieved chunk to the session chunk table once.
+        
+        Args:
+            result: Retrieval result
+            
+        Returns:
+            Index of the chunk in chunk_table
+        """
+        key = (
+            result["metadata"]["source_file"],
+            result["metadata"]["page"],
+            result.get("chunk_id")
+        )
+        
+        chunk_ref = self._chunk_ids.get(key)
+        if chunk_ref is None:
+            chunk_ref = len(self.chunk_table)
+            self._chunk_ids[key] = chunk_ref
+            self.chunk_table.append({
+                "source_file": key[0],
+                "page": key[1],
+                "chunk_id": key[2],
+                "text_preview": result["text"][:200]
             })
         
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "DOCUMENT_RETRIEVAL",
-            "data": {
-                "query": query,
-                "top_k": top_k,
-                "results_count": len(results),
-                "results": simplified_results
-            }
-        }
-        self.audit_trail["events"].append(event)
+        return chunk_ref
     
     def log_llm_call(self, 
                      prompt: str, 
@@ -96,17 +409,25 @@ class AuditLogger:
             model: Model name
             tokens_used: Number of tokens used
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "LLM_REASONING",
-            "data": {
-                "model": model,
-                "tokens_used": tokens_used,
-                "prompt_preview": prompt[:500] if len(prompt) > 500 else prompt,
-                "response": response
-            }
-        }
-        self.audit_trail["events"].append(event)
+        self._new_event("LLM_REASONING", {
+            "model": model,
+            "tokens_used": tokens_used,
+            "prompt_preview": prompt[:500] if len(prompt) > 500 else prompt,
+            "response": response
+        })
+    
+    def log_cache_hit(self, cache_type: str, similarity: float = None):
+        """
+        Log an analysis served from cache.
+        
+        Args:
+            cache_type: Cache that served the analysis
+            similarity: Similarity score of the cached query
+        """
+        self._new_event("CACHE_HIT", {
+            "cache_type": cache_type,
+            "similarity": similarity
+        })
     
     def log_validation(self, validation_result):
         """
@@ -115,17 +436,12 @@ class AuditLogger:
         Args:
             validation_result: ValidationResult object
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "VALIDATION",
-            "data": {
-                "summary": validation_result.get_summary(),
-                "errors": validation_result.errors,
-                "warnings": validation_result.warnings,
-                "info": validation_result.info
-            }
-        }
-        self.audit_trail["events"].append(event)
+        self._new_event("VALIDATION", {
+            "summary": validation_result.get_summary(),
+            "errors": validation_result.errors,
+            "warnings": validation_result.warnings,
+            "info": validation_result.info
+        })
     
     def log_template_mapping(self, template_code: str, fields_count: int):
         """
@@ -135,15 +451,10 @@ class AuditLogger:
             template_code: COREP template code
             fields_count: Number of fields mapped
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "TEMPLATE_MAPPING",
-            "data": {
-                "template_code": template_code,
-                "fields_count": fields_count
-            }
-        }
-        self.audit_trail["events"].append(event)
+        self._new_event("TEMPLATE_MAPPING", {
+            "template_code": template_code,
+            "fields_count": fields_count
+        })
     
     def log_export(self, output_path: str, format: str = "xlsx"):
         """
@@ -153,15 +464,10 @@ class AuditLogger:
             output_path: Path to exported file
             format: File format
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "FILE_EXPORT",
-            "data": {
-                "output_path": output_path,
-                "format": format
-            }
-        }
-        self.audit_trail["events"].append(event)
+        self._new_event("FILE_EXPORT", {
+            "output_path": output_path,
+            "format": format
+        })
     
     def log_error(self, error_type: str, error_message: str, details: Dict = None):
         """
@@ -172,48 +478,138 @@ class AuditLogger:
             error_message: Error message
             details: Additional details
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": "ERROR",
-            "data": {
-                "error_type": error_type,
-                "message": error_message,
-                "details": details or {}
-            }
-        }
-        self.audit_trail["events"].append(event)
+        self._new_event("ERROR", {
+            "error_type": error_type,
+            "message": error_message,
+            "details": details or {}
+        })
     
-    def save_log(self, filename: str = None) -> str:
+    def get_log_path(self) -> str:
+        """
+        Get the path the session log is saved to by default.
+        
+        The filename is fixed on first use, so the path can be handed out
+        before save_log() runs (e.g. when saving in a background task).
+        
+        Returns:
+            Path to the session log file
+        """
+        if self._default_filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._default_filename = f"audit_log_{timestamp}_{self.session_id[:8]}.json"
+        
+        return str(self.log_dir / self._default_filename)
+    
+    def save_log(self,
+                 filename: str = None,
+                 compress: Optional[str] = None,
+                 pretty: bool = False,
+                 jsonl: bool = False,
+                 wait: bool = False) -> str:
         """
         Save audit log to file.
         
+        The JSON log is serialized here and written by a background thread;
+        pass wait=True (or call flush_and_close()) before reading the file.
+        With jsonl=True the events are streamed one per line and the session
+        header (id, start/end, duration, chunk table) goes to a small
+        "<name>.meta.json" sidecar instead of wrapping the events.
+        
         Args:
-            filename: Optional filename (auto-generated if not provided)
+            filename: Optional filename (defaults to get_log_path())
+            compress: Optional codec, "zstd" or "lz4" (suffix added to the name)
+            pretty: Indent the JSON for reading (slower, larger; ignored for JSONL)
+            jsonl: Write events as JSON lines plus a metadata sidecar
+            wait: Block until the file has been written
             
         Returns:
             Path to saved log file
         """
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"audit_log_{timestamp}_{self.session_id[:8]}.json"
+            log_path = Path(self.get_log_path())
+        else:
+            log_path = self.log_dir / filename
+        
+        if compress == "zstd" and zstandard is None:
+            log.warning("zstandard not installed, saving uncompressed audit log")
+            compress = None
+        elif compress == "lz4" and lz4f is None:
+            log.warning("lz4 not installed, saving uncompressed audit log")
+            compress = None
+        elif compress not in (None, "zstd", "lz4"):
+            raise ValueError(f"Unsupported audit log compression: {compress}")
+        
+        self._flush()
         
-        log_path = self.log_dir / filename
+        # Add session end time and duration
+        end_ns = self._now()
+        self.audit_trail["session_end"] = self._format_ts(end_ns)
+        self.audit_trail["session_duration_seconds"] = (end_ns - self._start_ns) / 1e9
+        self.audit_trail["chunk_table"] = self.chunk_table
         
-        # Add session end time
-        self.audit_trail["session_end"] = datetime.now().isoformat()
+        if jsonl:
+            return self._save_jsonl(log_path, compress)
+        
+        # Serialize in one pass and save with a single write
+        trail = {
+            **self.audit_trail,
+            "events": [self._export_event(event) for event in self.audit_trail["events"]]
+        }
+        payload = _dumps(trail, pretty=pretty)
         
-        # Calculate session duration
-        start = datetime.fromisoformat(self.session_start)
-        end = datetime.now()
-        duration = (end - start).total_seconds()
-        self.audit_trail["session_duration_seconds"] = duration
+        if compress == "zstd":
+            log_path = log_path.with_name(log_path.name + ".zst")
+            payload = zstandard.ZstdCompressor(level=3).compress(payload)
+        elif compress == "lz4":
+            log_path = log_path.with_name(log_path.name + ".lz4")
+            payload = lz4f.compress(payload)
         
-        # Save to file
-        with open(log_path, "w", encoding="utf-8") as f:
-            json.dump(self.audit_trail, f, indent=2, ensure_ascii=False)
+        _get_writer().submit(log_path, payload)
+        if wait:
+            wait_for_writes()
         
         return str(log_path)
     
+    def _save_jsonl(self, log_path: Path, compress: Optional[str]) -> str:
+        """
+        Stream events as JSON lines and write the session header sidecar.
+        
+        Args:
+            log_path: Base log path (".json" is replaced by ".jsonl")
+            compress: Optional codec, "zstd" or "lz4"
+            
+        Returns:
+            Path to the events file
+        """
+        events_path = log_path.with_suffix(".jsonl")
+        meta_path = log_path.with_suffix(".meta.json")
+        
+        if compress == "zstd":
+            events_path = events_path.with_name(events_path.name + ".zst")
+            compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        elif compress == "lz4":
+            events_path = events_path.with_name(events_path.name + ".lz4")
+            compressor = lz4f.LZ4FrameCompressor()
+        else:
+            compressor = None
+        
+        with open(events_path, "wb") as f:
+            if compress == "lz4":
+                f.write(compressor.begin())
+            
+            for event in self.audit_trail["events"]:
+                line = _dumps(self._export_event(event)) + b"\n"
+                f.write(compressor.compress(line) if compressor else line)
+            
+            if compressor is not None:
+                f.write(compressor.flush())
+        
+        meta = {k: v for k, v in self.audit_trail.items() if k != "events"}
+        meta["events_file"] = events_path.name
+        meta_path.write_bytes(_dumps(meta))
+        
+        return str(events_path)
+    
     def get_trail_summary(self) -> Dict:
         """
         Get summary of audit trail.
@@ -221,6 +617,8 @@ class AuditLogger:
         Returns:
             Summary dictionary
         """
+        self._flush()
+        
         event_types = {}
         for event in self.audit_trail["events"]:
             event_type = event["event_type"]
@@ -240,6 +638,8 @@ class AuditLogger:
         Returns:
             Formatted string
         """
+        self._flush()
+        
         lines = []
         lines.append("=" * 80)
         lines.append("AUDIT TRAIL")
@@ -250,35 +650,11 @@ class AuditLogger:
         
         for i, event in enumerate(self.audit_trail["events"], 1):
             lines.append(f"{i}. {event['event_type']}")
-            lines.append(f"   Time: {event['timestamp']}")
-            
-            # Format event data
-            if event['event_type'] == "USER_QUERY":
-                lines.append(f"   Question: {event['data']['question']}")
-                lines.append(f"   Scenario: {event['data']['scenario'][:100]}...")
-            
-            elif event['event_type'] == "DOCUMENT_RETRIEVAL":
-                lines.append(f"   Query: {event['data']['query']}")
-                lines.append(f"   Results: {event['data']['results_count']} chunks retrieved")
-            
-            elif event['event_type'] == "LLM_REASONING":
-                lines.append(f"   Model: {event['data']['model']}")
-                lines.append(f"   Tokens: {event['data'].get('tokens_used', 'N/A')}")
+            lines.append(f"   Time: {self._format_ts(event['ts_ns'])}")
             
-            elif event['event_type'] == "VALIDATION":
-                summary = event['data']['summary']
-                lines.append(f"   Valid: {summary['is_valid']}")
-                lines.append(f"   Errors: {summary['errors']}, Warnings: {summary['warnings']}")
-            
-            elif event['event_type'] == "TEMPLATE_MAPPING":
-                lines.append(f"   Template: {event['data']['template_code']}")
-                lines.append(f"   Fields: {event['data']['fields_count']}")
-            
-            elif event['event_type'] == "FILE_EXPORT":
-                lines.append(f"   Path: {event['data']['output_path']}")
-            
-            elif event['event_type'] == "ERROR":
-                lines.append(f"   Error: {event['data']['message']}")
+            formatter = self._FORMATTERS.get(event['event_type'])
+            if formatter is not None:
+                formatter(lines, event['data'])
             
             lines.append("")
         
@@ -286,6 +662,39 @@ class AuditLogger:
         return "\n".join(lines)
 
 
+def iter_log_events(path: str):
+    """
+    Stream events back from a JSONL audit log written with save_log(jsonl=True).
+    
+    Args:
+        path: Path to a ".jsonl", ".jsonl.lz4" or ".jsonl.zst" file
+        
+    Yields:
+        Event dictionaries in logged order
+    """
+    with open(path, "rb") as f:
+        if path.endswith(".lz4"):
+            stream = lz4f.LZ4FrameFile(f, mode="rb")
+        elif path.endswith(".zst"):
+            stream = zstandard.ZstdDecompressor().stream_reader(f)
+        else:
+            stream = f
+        
+        buffer = b""
+        while True:
+            block = stream.read(1 << 16)
+            if not block:
+                break
+            buffer += block
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+        
+        if buffer.strip():
+            yield json.loads(buffer)
+
+
 def create_audit_logger(log_dir: str = "audit_logs") -> AuditLogger:
     """
     Convenience function to create audit logger.
@@ -333,3 +742,5 @@ if __name__ == "__main__":
     
     # Print formatted trail
     print("\n" + logger.get_formatted_trail())
+    
+    logger.flush_and_close()
@@ -25,25 +25,43 @@ AUDIT_LOG_DIR.mkdir(exist_ok=True)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0.1"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", str(DATA_DIR / "llm_cache"))  # empty disables
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
 
 # Embedding settings
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "")  # exported ONNX query encoder; empty disables
 CHUNK_MIN_SIZE = int(os.getenv("CHUNK_MIN_SIZE", "400"))
 CHUNK_MAX_SIZE = int(os.getenv("CHUNK_MAX_SIZE", "600"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 
 # Retrieval settings
 DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", "5"))
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "4000"))  # retrieved-rule tokens per prompt
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "hnsw")  # flat, hnsw, ivfpq, sq8, fp16 or hnsw_sq8
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+# Exact-match cache settings
+EXACT_CACHE_CAPACITY = int(os.getenv("EXACT_CACHE_CAPACITY", "1024"))
+
+# Semantic cache settings
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
 
 # API settings
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
+API_MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", "32"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
 
 # Streamlit settings
 STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", "8501"))
 
 # Template settings
 DEFAULT_TEMPLATE = "C01.00"
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "pyexcelerate")
 
 # Validation settings
 ENABLE_VALIDATION = os.getenv("ENABLE_VALIDATION", "true").lower() == "true"
@@ -63,21 +81,39 @@ def get_config() -> dict:
         "gemini": {
             "api_key_set": bool(GOOGLE_API_KEY),
             "model": GEMINI_MODEL,
-            "temperature": GEMINI_TEMPERATURE
+            "temperature": GEMINI_TEMPERATURE,
+            "cache_dir": LLM_CACHE_DIR,
+            "cache_ttl": LLM_CACHE_TTL
         },
         "embedding": {
             "model": EMBEDDING_MODEL,
+            "onnx_model_dir": ONNX_MODEL_DIR,
             "chunk_min_size": CHUNK_MIN_SIZE,
             "chunk_max_size": CHUNK_MAX_SIZE,
             "chunk_overlap": CHUNK_OVERLAP
         },
         "retrieval": {
-            "default_top_k": DEFAULT_TOP_K
+            "default_top_k": DEFAULT_TOP_K,
+            "max_context_tokens": MAX_CONTEXT_TOKENS,
+            "index_type": RAG_INDEX_TYPE,
+            "hnsw_ef_search": HNSW_EF_SEARCH,
+            "ivf_nprobe": IVF_NPROBE
+        },
+        "exact_cache": {
+            "capacity": EXACT_CACHE_CAPACITY
+        },
+        "semantic_cache": {
+            "threshold": SEMANTIC_CACHE_THRESHOLD,
+            "ttl": SEMANTIC_CACHE_TTL,
+            "max_entries": SEMANTIC_CACHE_MAX_ENTRIES
         },
         "api": {
             "host": API_HOST,
-            "port": API_PORT
+            "port": API_PORT,
+            "max_concurrent_requests": API_MAX_CONCURRENT_REQUESTS,
+            "llm_max_concurrency": LLM_MAX_CONCURRENCY
         },
+        "excel_engine": EXCEL_ENGINE,
         "validation_enabled": ENABLE_VALIDATION,
         "audit_logging_enabled": ENABLE_AUDIT_LOGGING
     }
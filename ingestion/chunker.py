@@ -3,11 +3,24 @@ Text chunking module for splitting documents into manageable pieces.
 Creates chunks of 400-600 tokens with metadata preservation.
 """
 
+import os
 import re
+import sys
+from functools import lru_cache
 from typing import List, Dict
 import tiktoken
 
 
+# Sentence end: terminal punctuation followed by whitespace (no lookbehind)
+SENTENCE_BOUNDARY = re.compile(r'([.!?])\s+')
+
+
+@lru_cache(maxsize=1)
+def _get_cl100k() -> tiktoken.Encoding:
+    """Load the cl100k_base tokenizer once per process."""
+    return tiktoken.get_encoding("cl100k_base")
+
+
 class TextChunker:
     """Chunks text into token-sized pieces with overlap."""
     
@@ -28,7 +41,7 @@ class TextChunker:
         self.overlap = overlap
         
         # Initialize tokenizer (using cl100k_base for OpenAI models)
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = _get_cl100k()
         
     def chunk_documents(self, documents: List[Dict]) -> List[Dict]:
         """
@@ -65,35 +78,41 @@ class TextChunker:
         # Split into sentences for better chunking
         sentences = self._split_into_sentences(text)
         
+        # Tokenize all sentences in one batched call; the leading space makes
+        # concatenated IDs decode back to space-joined text
+        sentence_ids = self.tokenizer.encode_ordinary_batch(
+            [" " + sentence for sentence in sentences],
+            num_threads=os.cpu_count() or 1
+        )
+        
         chunks = []
         current_chunk = []
-        current_tokens = 0
+        current_token_ids = []
         
-        for sentence in sentences:
-            sentence_tokens = len(self.tokenizer.encode(sentence))
+        for sentence, ids in zip(sentences, sentence_ids):
             
             # If adding this sentence exceeds max, save current chunk
-            if current_tokens + sentence_tokens > self.max_chunk_size and current_chunk:
+            if len(current_token_ids) + len(ids) > self.max_chunk_size and current_chunk:
                 chunk_text = " ".join(current_chunk)
-                if current_tokens >= self.min_chunk_size:
-                    chunks.append(self._create_chunk(chunk_text, metadata, len(chunks)))
+                if len(current_token_ids) >= self.min_chunk_size:
+                    chunks.append(self._create_chunk(chunk_text, metadata, len(chunks), len(current_token_ids)))
                     
-                    # Keep overlap sentences for context
-                    overlap_text = chunk_text.split()[-self.overlap:]
-                    current_chunk = [" ".join(overlap_text)]
-                    current_tokens = len(self.tokenizer.encode(current_chunk[0]))
+                    # Carry the last `overlap` tokens into the next chunk
+                    overlap_ids = current_token_ids[-self.overlap:] if self.overlap > 0 else []
+                    current_chunk = [self.tokenizer.decode(overlap_ids).strip()] if overlap_ids else []
+                    current_token_ids = list(overlap_ids)
                 else:
                     current_chunk = []
-                    current_tokens = 0
+                    current_token_ids = []
             
             current_chunk.append(sentence)
-            current_tokens += sentence_tokens
+            current_token_ids.extend(ids)
         
         # Add remaining chunk
         if current_chunk:
             chunk_text = " ".join(current_chunk)
-            if current_tokens >= self.min_chunk_size or not chunks:
-                chunks.append(self._create_chunk(chunk_text, metadata, len(chunks)))
+            if len(current_token_ids) >= self.min_chunk_size or not chunks:
+                chunks.append(self._create_chunk(chunk_text, metadata, len(chunks), len(current_token_ids)))
         
         return chunks
     
@@ -107,11 +126,20 @@ class TextChunker:
         Returns:
             List of sentences
         """
-        # Simple sentence splitter
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+        # Split on terminal punctuation + whitespace; the captured punctuation
+        # comes back as every other piece and is re-attached to its sentence
+        pieces = SENTENCE_BOUNDARY.split(text)
+        sentences = [
+            sentence + end for sentence, end in zip(pieces[::2], pieces[1::2] + [""])
+        ]
+        
+        return [stripped for stripped in (s.strip() for s in sentences) if stripped]
     
-    def _create_chunk(self, text: str, original_metadata: Dict, chunk_index: int) -> Dict:
+    def _create_chunk(self,
+                      text: str,
+                      original_metadata: Dict,
+                      chunk_index: int,
+                      token_count: int) -> Dict:
         """
         Create a chunk dictionary with metadata.
         
@@ -119,17 +147,24 @@ class TextChunker:
             text: Chunk text
             original_metadata: Metadata from original document
             chunk_index: Index of this chunk
+            token_count: Number of tokens in the chunk
             
         Returns:
             Chunk dictionary
         """
+        metadata = {
+            **original_metadata,
+            "chunk_index": chunk_index,
+            "chunk_tokens": token_count
+        }
+        
+        # Share one string object per source file across all its chunks
+        if "source_file" in metadata:
+            metadata["source_file"] = sys.intern(metadata["source_file"])
+        
         return {
             "text": text,
-            "metadata": {
-                **original_metadata,
-                "chunk_index": chunk_index,
-                "chunk_tokens": len(self.tokenizer.encode(text))
-            }
+            "metadata": metadata
         }
 
 
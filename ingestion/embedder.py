@@ -3,48 +3,128 @@ Embedding generation and FAISS index creation.
 Processes documents, generates embeddings, and stores in vector database.
 """
 
+import hashlib
 import os
-import pickle
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
+from typing import TYPE_CHECKING, Iterator, List, Dict, Optional, Tuple
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
 
+from config import ONNX_MODEL_DIR, RAG_INDEX_TYPE
 from ingestion.loader import load_documents
 from ingestion.chunker import chunk_documents
 
+# faiss, torch, pyarrow and sentence_transformers are imported where they are
+# first used so that importing this module stays cheap
+if TYPE_CHECKING:
+    import faiss
+    import pyarrow as pa
+    from sentence_transformers import SentenceTransformer
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def chunk_vector_id(chunk: Dict) -> int:
+    """
+    Stable 63-bit id for a chunk, used as its FAISS id.
+    
+    Hashes the source file, page and text, so re-ingesting an unchanged
+    PDF yields the same ids and its chunks are not embedded again.
+    
+    Args:
+        chunk: Chunk dictionary
+        
+    Returns:
+        Non-negative int64 id
+    """
+    metadata = chunk["metadata"]
+    key = f"{metadata.get('source_file')}\0{metadata.get('page')}\0{chunk['text']}".encode("utf-8")
+    
+    if xxhash is not None:
+        digest = xxhash.xxh64_intdigest(key)
+    else:
+        digest = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+    
+    return digest & ((1 << 63) - 1)
+
+
+@lru_cache(maxsize=None)
+def _get_st_model(model_name: str, device: str) -> "SentenceTransformer":
+    """
+    Load a SentenceTransformer once per (model, device) per process.
+    
+    Args:
+        model_name: SentenceTransformer model name
+        device: Torch device
+        
+    Returns:
+        Shared model instance
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    model = SentenceTransformer(model_name, device=device)
+    
+    # Half precision halves memory traffic on GPU; CPUs stay in fp32
+    if device.startswith("cuda"):
+        model.half()
+    
+    return model
+
 
 class EmbeddingPipeline:
     """Creates embeddings and builds FAISS index."""
     
+    # Vectors buffered to train quantized indexes before streaming the rest
+    TRAIN_SAMPLE_SIZE = 10000
+    TRAINED_INDEX_TYPES = ("ivfpq", "sq8", "fp16", "hnsw_sq8")
+    
     def __init__(self, 
                  model_name: str = "all-MiniLM-L6-v2",
-                 data_dir: str = "data"):
+                 data_dir: str = "data",
+                 device: str = None,
+                 batch_size: int = 128,
+                 index_type: str = RAG_INDEX_TYPE):
         """
         Initialize the embedding pipeline.
         
         Args:
             model_name: SentenceTransformer model name
             data_dir: Directory to save index and metadata
+            device: Torch device (defaults to CUDA when available, else CPU)
+            batch_size: Number of chunks encoded per forward pass
+            index_type: FAISS index to build ("flat", "hnsw", "ivfpq",
+                "sq8", "fp16" or "hnsw_sq8"; defaults to RAG_INDEX_TYPE)
         """
         self.model_name = model_name
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
+        self.index_type = index_type
+        if device is None:
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        self.batch_size = batch_size
         
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        print(f"Loading embedding model: {model_name} ({self.device})")
+        self.model = _get_st_model(model_name, self.device)
         print("Model loaded successfully")
         
         self.index_path = self.data_dir / "index.faiss"
-        self.metadata_path = self.data_dir / "metadata.pkl"
+        self.metadata_path = self.data_dir / "metadata.parquet"
         
-    def build_index_from_pdfs(self, input_dir: str) -> None:
+    def build_index_from_pdfs(self, input_dir: str, rebuild: bool = False) -> None:
         """
         Complete pipeline: load PDFs, chunk, embed, and build index.
         
+        When an index built by this pipeline already exists, only chunks
+        not yet in it are embedded and added.
+        
         Args:
             input_dir: Directory containing PDF files
+            rebuild: Discard any existing index and embed everything
         """
         print("\n=== Starting Document Ingestion Pipeline ===\n")
         
@@ -64,86 +144,307 @@ class EmbeddingPipeline:
             print("No chunks created. Exiting.")
             return
         
-        # Step 3: Generate embeddings
-        print("\nStep 3: Generating embeddings...")
-        embeddings = self._generate_embeddings(chunks)
-        
-        # Step 4: Build FAISS index
-        print("\nStep 4: Building FAISS index...")
-        self._build_faiss_index(embeddings, chunks)
+        # Step 3: Generate embeddings and build (or extend) the FAISS index
+        if not rebuild and self._can_update():
+            print("\nStep 3: Adding new chunks to the existing FAISS index...")
+            self._update_faiss_index(chunks)
+        else:
+            print("\nStep 3: Generating embeddings and building FAISS index...")
+            self._build_faiss_index(chunks)
         
         print("\n=== Pipeline Complete ===")
         print(f"Index saved to: {self.index_path}")
         print(f"Metadata saved to: {self.metadata_path}")
         
-    def _generate_embeddings(self, chunks: List[Dict]) -> np.ndarray:
+    def export_onnx(self, output_dir: str) -> None:
         """
-        Generate embeddings for all chunks.
+        Export the embedding model as an int8 ONNX query encoder.
+        
+        Args:
+            output_dir: Directory the retriever's onnx_dir will point at
+        """
+        from rag.onnx_encoder import export_onnx_model
+        
+        try:
+            export_onnx_model(self.model_name, output_dir)
+        except ImportError as e:
+            print(f"Skipping ONNX export ({e}); install optimum[onnxruntime] to enable it")
+        
+    def _generate_embeddings(self, chunks: List[Dict]) -> Iterator[np.ndarray]:
+        """
+        Generate embeddings for all chunks, one batch at a time.
+        
+        Only one batch of texts and vectors is alive at once, so peak memory
+        doesn't grow with the corpus.
         
         Args:
             chunks: List of chunk dictionaries
             
-        Returns:
-            Numpy array of embeddings
+        Yields:
+            Normalized float32 embeddings of shape (batch, dim)
+        """
+        total = len(chunks)
+        print(f"Generating embeddings for {total} chunks...")
+        
+        for start in range(0, total, self.batch_size):
+            texts = [chunk["text"] for chunk in chunks[start:start + self.batch_size]]
+            
+            # encode() length-sorts each call internally, so batches are already
+            # padded uniformly; normalized outputs make L2 and cosine rank alike
+            embeddings = self.model.encode(
+                texts,
+                show_progress_bar=False,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            print(f"  Embedded {min(start + self.batch_size, total)}/{total}")
+            
+            yield np.ascontiguousarray(embeddings, dtype=np.float32)
+    
+    def _build_faiss_index(self, chunks: List[Dict]) -> None:
+        """
+        Build and save a new FAISS index, adding vectors incrementally.
+        
+        Args:
+            chunks: Chunk dictionaries
+        """
+        chunks, ids = self._with_vector_ids(chunks)
+        index = self._add_chunks(None, chunks, ids)
+        
+        self._write_index(index)
+        print(f"FAISS index created with {index.ntotal} vectors")
+        
+        self._write_metadata(self._metadata_table(chunks, ids))
+        print(f"Metadata saved: {len(chunks)} entries")
+    
+    def _write_index(self, index: "faiss.Index") -> None:
+        """
+        Save the index via a temporary file and an atomic rename.
+        
+        Retrievers memory-map index.faiss; replacing the file (rather than
+        rewriting it in place) leaves their mapping of the old one intact.
+        """
+        import faiss
+        
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+    
+    def _write_metadata(self, table: "pa.Table") -> None:
+        """Save the metadata table via a temporary file and an atomic rename."""
+        import pyarrow.parquet as pq
+        
+        tmp_path = self.metadata_path.with_name(self.metadata_path.name + ".tmp")
+        pq.write_table(table, tmp_path, compression="snappy")
+        os.replace(tmp_path, self.metadata_path)
+    
+    def _can_update(self) -> bool:
+        """Whether the saved index can be extended in place."""
+        if not (self.index_path.exists() and self.metadata_path.exists()):
+            return False
+        
+        import pyarrow.parquet as pq
+        
+        # Only indexes keyed by chunk id from the same model can be extended
+        schema = pq.read_schema(self.metadata_path)
+        model_name = (schema.metadata or {}).get(b"model_name", b"").decode("utf-8")
+        return "vector_id" in schema.names and model_name == self.model_name
+    
+    def _update_faiss_index(self, chunks: List[Dict]) -> None:
         """
-        texts = [chunk["text"] for chunk in chunks]
+        Embed only chunks missing from the saved index and append them.
+        
+        Args:
+            chunks: Chunk dictionaries for every input PDF
+        """
+        import faiss
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        index = faiss.read_index(str(self.index_path))
+        table = pq.read_table(self.metadata_path)
+        known = set(table.column("vector_id").to_pylist())
+        
+        chunks, ids = self._with_vector_ids(chunks)
+        new_rows = [i for i, vector_id in enumerate(ids) if vector_id not in known]
+        
+        if not new_rows:
+            print(f"All {len(chunks)} chunks already indexed; nothing to add")
+            return
         
-        print(f"Generating embeddings for {len(texts)} chunks...")
-        embeddings = self.model.encode(
-            texts,
-            show_progress_bar=True,
-            batch_size=32,
-            convert_to_numpy=True
-        )
+        chunks = [chunks[i] for i in new_rows]
+        ids = [ids[i] for i in new_rows]
+        print(f"{len(chunks)} new chunks ({len(known)} already indexed)")
         
-        print(f"Embeddings shape: {embeddings.shape}")
-        return embeddings
+        index = self._add_chunks(index, chunks, ids)
+        self._write_index(index)
+        print(f"FAISS index now holds {index.ntotal} vectors")
+        
+        new_table = self._metadata_table(chunks, ids).select(table.column_names).cast(table.schema)
+        self._write_metadata(pa.concat_tables([table, new_table]))
+        print(f"Metadata saved: {table.num_rows + new_table.num_rows} entries")
     
-    def _build_faiss_index(self, embeddings: np.ndarray, chunks: List[Dict]) -> None:
+    def _with_vector_ids(self, chunks: List[Dict]) -> Tuple[List[Dict], List[int]]:
         """
-        Build and save FAISS index.
+        Drop duplicate chunks and order the rest for embedding.
         
         Args:
-            embeddings: Embedding vectors
             chunks: Chunk dictionaries
+            
+        Returns:
+            (chunks, vector ids) in matching order
         """
-        dimension = embeddings.shape[1]
+        unique = {}
+        for chunk in chunks:
+            unique.setdefault(chunk_vector_id(chunk), chunk)
         
-        # Create FAISS index (L2 distance)
-        index = faiss.IndexFlatL2(dimension)
-        index.add(embeddings)
+        # Order chunks by length so each encode batch pads to similar lengths
+        ordered = sorted(unique.items(), key=lambda item: item[1]["metadata"].get("chunk_tokens") or len(item[1]["text"]))
+        return [chunk for _, chunk in ordered], [vector_id for vector_id, _ in ordered]
+    
+    def _add_chunks(self,
+                    index: Optional["faiss.Index"],
+                    chunks: List[Dict],
+                    ids: List[int]) -> "faiss.Index":
+        """
+        Embed chunks batch by batch and add them under their vector ids.
         
-        # Save index
-        faiss.write_index(index, str(self.index_path))
-        print(f"FAISS index created with {index.ntotal} vectors")
+        With no index yet, one is created; index types that need training
+        buffer the first TRAIN_SAMPLE_SIZE vectors, train on them, then
+        stream the rest.
+        
+        Args:
+            index: Existing ID-mapped index, or None to create one
+            chunks: Chunk dictionaries
+            ids: Vector id per chunk
+            
+        Returns:
+            Index holding the added vectors
+        """
+        import faiss
+        
+        # Training and add() parallelize over OpenMP; use every core for the
+        # build even if the serving process pinned FAISS to fewer threads
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+        
+        ids = np.asarray(ids, dtype=np.int64)
+        pending = []
+        added = 0
+        needs_training = self.index_type in self.TRAINED_INDEX_TYPES
+        
+        for embeddings in self._generate_embeddings(chunks):
+            if index is not None:
+                index.add_with_ids(embeddings, ids[added:added + len(embeddings)])
+                added += len(embeddings)
+                continue
+            
+            pending.append(embeddings)
+            
+            if not needs_training or sum(len(batch) for batch in pending) >= self.TRAIN_SAMPLE_SIZE:
+                index = self._create_index_from_batches(pending, ids)
+                added = index.ntotal
+                pending = []
+        
+        if index is None:
+            index = self._create_index_from_batches(pending, ids)
+        
+        return index
+    
+    def _create_index_from_batches(self, batches: List[np.ndarray], ids: np.ndarray) -> "faiss.Index":
+        """Create (and train) an ID-mapped index on buffered batches, then add them."""
+        import faiss
+        
+        embeddings = np.concatenate(batches)
+        index = faiss.IndexIDMap2(self._create_index(embeddings))
+        index.add_with_ids(embeddings, ids[:len(embeddings)])
+        return index
+    
+    def _metadata_table(self, chunks: List[Dict], ids: List[int]) -> "pa.Table":
+        """Text, vector id and one column per metadata field (row i = chunk i)."""
+        import pyarrow as pa
         
-        # Save metadata
         metadata = [chunk["metadata"] for chunk in chunks]
-        texts = [chunk["text"] for chunk in chunks]
         
-        data_to_save = {
-            "chunks": chunks,
-            "texts": texts,
-            "metadata": metadata,
-            "model_name": self.model_name
+        columns = {
+            "text": [chunk["text"] for chunk in chunks],
+            "vector_id": pa.array(ids, type=pa.int64())
         }
+        for key in metadata[0]:
+            columns[key] = [m.get(key) for m in metadata]
         
-        with open(self.metadata_path, "wb") as f:
-            pickle.dump(data_to_save, f)
+        table = pa.Table.from_pydict(columns)
+        return table.replace_schema_metadata({"model_name": self.model_name})
+    
+    def _create_index(self, embeddings: np.ndarray) -> "faiss.Index":
+        """
+        Create an empty (trained) inner-product index for normalized embeddings.
         
-        print(f"Metadata saved: {len(metadata)} entries")
+        Args:
+            embeddings: Normalized embedding vectors (used for training)
+            
+        Returns:
+            FAISS index ready for add()
+        """
+        import faiss
+        
+        n, dimension = embeddings.shape
+        index_type = self.index_type
+        
+        # 8-bit PQ codebooks have 256 centroids each and FAISS wants ~39
+        # training points per centroid
+        if index_type == "ivfpq" and n < 39 * 256:
+            print(f"Only {n} vectors, too few to train IVF-PQ; using HNSW instead")
+            index_type = "hnsw"
+        
+        if index_type == "flat":
+            index = faiss.IndexFlatIP(dimension)
+        
+        elif index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+        
+        elif index_type == "ivfpq":
+            # ~sqrt(N) lists, keeping the 39 training points per centroid FAISS wants
+            nlist = max(1, min(int(np.sqrt(n)), n // 39))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, 48, 8, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+            index.nprobe = min(8, nlist)
+        
+        elif index_type in ("sq8", "fp16"):
+            # Scalar quantization stores 1 or 2 bytes per dimension instead of 4
+            qtype = faiss.ScalarQuantizer.QT_8bit if index_type == "sq8" else faiss.ScalarQuantizer.QT_fp16
+            index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+        
+        elif index_type == "hnsw_sq8":
+            # HNSW graph over 8-bit codes: sub-linear search on a 4x smaller store
+            index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+            index.train(embeddings)
+        
+        else:
+            raise ValueError(f"Unknown index type: {self.index_type}")
+        
+        print(f"Building {index_type} index (inner product, dim={dimension})")
+        return index
 
 
-def build_index(input_dir: str, data_dir: str = "data") -> None:
+def build_index(input_dir: str, data_dir: str = "data", onnx_dir: str = ONNX_MODEL_DIR) -> None:
     """
     Convenience function to build index.
     
     Args:
         input_dir: Directory with PDF files
         data_dir: Directory to save index
+        onnx_dir: Also export the ONNX query encoder here (empty skips it)
     """
     pipeline = EmbeddingPipeline(data_dir=data_dir)
     pipeline.build_index_from_pdfs(input_dir)
+    
+    if onnx_dir:
+        pipeline.export_onnx(onnx_dir)
 
 
 if __name__ == "__main__":
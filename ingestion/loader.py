@@ -3,23 +3,48 @@ PDF document loader for COREP regulatory documents.
 Extracts text from PDFs with metadata (page numbers, source files).
 """
 
+import importlib
 import os
-from typing import List, Dict
-import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 
+# Native text extractors (PDFium, MuPDF) are much faster than pdfplumber's
+# pure-Python layout analysis; the first one installed is used
+PDF_BACKENDS = ("pypdfium2", "fitz", "pdfplumber")
+
+
+@lru_cache(maxsize=1)
+def _pdf_backend() -> Tuple[str, Any]:
+    """
+    Import the preferred PDF library on first use (once per process).
+    
+    Returns:
+        (module name, module) of the first available backend
+    """
+    for name in PDF_BACKENDS:
+        try:
+            return name, importlib.import_module(name)
+        except ImportError:
+            continue
+    
+    raise ImportError("No PDF backend installed (pypdfium2, PyMuPDF or pdfplumber)")
+
 
 class DocumentLoader:
     """Loads and extracts text from PDF files."""
     
-    def __init__(self, input_dir: str):
+    def __init__(self, input_dir: str, max_workers: Optional[int] = None):
         """
         Initialize the document loader.
         
         Args:
             input_dir: Path to directory containing PDF files
+            max_workers: Worker processes for extraction (defaults to CPU count)
         """
         self.input_dir = Path(input_dir)
+        self.max_workers = max_workers or os.cpu_count() or 1
         
     def load_all_pdfs(self) -> List[Dict]:
         """
@@ -42,10 +67,12 @@ class DocumentLoader:
         
         print(f"Found {len(pdf_files)} PDF files to process")
         
-        for pdf_path in pdf_files:
-            print(f"Loading: {pdf_path.name}")
-            docs = self._load_single_pdf(pdf_path)
-            documents.extend(docs)
+        # PDFs are independent, so extract them in parallel processes
+        workers = min(self.max_workers, len(pdf_files))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for pdf_path, docs in zip(pdf_files, executor.map(_extract_pdf_worker, pdf_files)):
+                print(f"Loaded: {pdf_path.name} ({len(docs)} pages)")
+                documents.extend(docs)
             
         print(f"Total documents extracted: {len(documents)}")
         return documents
@@ -60,28 +87,79 @@ class DocumentLoader:
         Returns:
             List of document dictionaries
         """
-        documents = []
+        return _extract_pdf_worker(pdf_path)
+
+
+def _extract_pdf_worker(pdf_path: Path) -> List[Dict]:
+    """
+    Extract text by page from a single PDF (module-level so it can be pickled
+    for worker processes).
+    
+    Errors are caught here so one bad PDF doesn't fail the whole pool.
+    
+    Args:
+        pdf_path: Path to PDF file
         
+    Returns:
+        List of document dictionaries
+    """
+    documents = []
+    
+    try:
+        for page_num, total_pages, text in _iter_pdf_pages(pdf_path):
+            if text and text.strip():
+                doc = {
+                    "text": text.strip(),
+                    "metadata": {
+                        "source_file": pdf_path.name,
+                        "page": page_num,
+                        "total_pages": total_pages
+                    }
+                }
+                documents.append(doc)
+                
+    except Exception as e:
+        print(f"Error loading {pdf_path.name}: {str(e)}")
+        
+    return documents
+
+
+def _iter_pdf_pages(pdf_path: Path) -> Iterator[Tuple[int, int, str]]:
+    """
+    Yield (page number, total pages, text) for each page of a PDF.
+    
+    Uses pypdfium2, then PyMuPDF, then pdfplumber, whichever is installed.
+    
+    Args:
+        pdf_path: Path to PDF file
+    """
+    backend, lib = _pdf_backend()
+    
+    if backend == "pypdfium2":
+        pdf = lib.PdfDocument(str(pdf_path))
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    text = page.extract_text()
-                    
-                    if text and text.strip():
-                        doc = {
-                            "text": text.strip(),
-                            "metadata": {
-                                "source_file": pdf_path.name,
-                                "page": page_num,
-                                "total_pages": len(pdf.pages)
-                            }
-                        }
-                        documents.append(doc)
-                        
-        except Exception as e:
-            print(f"Error loading {pdf_path.name}: {str(e)}")
-            
-        return documents
+            total_pages = len(pdf)
+            for page_index in range(total_pages):
+                page = pdf[page_index]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                yield page_index + 1, total_pages, text
+        finally:
+            pdf.close()
+    
+    elif backend == "fitz":
+        with lib.open(pdf_path) as pdf:
+            total_pages = pdf.page_count
+            for page_index, page in enumerate(pdf):
+                yield page_index + 1, total_pages, page.get_text("text")
+    
+    else:
+        with lib.open(pdf_path) as pdf:
+            total_pages = len(pdf.pages)
+            for page_num, page in enumerate(pdf.pages, start=1):
+                yield page_num, total_pages, page.extract_text()
 
 
 def load_documents(input_dir: str) -> List[Dict]:
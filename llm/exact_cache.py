@@ -0,0 +1,95 @@
+"""
+Exact-match response cache for COREP analyses.
+Serves identical re-submissions without another LLM round-trip.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ExactCache:
+    """Thread-safe LRU cache keyed on the SHA-256 of the request."""
+    
+    def __init__(self, capacity: int = 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            capacity: Maximum number of cached responses
+        """
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(question: str, scenario: str, top_k: int, model_name: str) -> str:
+        """
+        Build a cache key for a request.
+        
+        The model name is part of the key so switching models never serves
+        answers produced by another model.
+        
+        Args:
+            question: User question
+            scenario: Scenario description
+            top_k: Number of retrieved chunks
+            model_name: LLM model name
+        
+        Returns:
+            Hex digest key
+        """
+        raw = f"{question}\0{scenario}\0{top_k}\0{model_name}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Key from make_key()
+        
+        Returns:
+            Cached entry with 'analysis', 'validation' and 'retrieved', or None on miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self,
+            key: str,
+            analysis: Dict,
+            validation: Any,
+            retrieved: Optional[List[Dict]] = None) -> None:
+        """
+        Store a response.
+        
+        Args:
+            key: Key from make_key()
+            analysis: LLM analysis result
+            validation: Validation result served alongside the analysis
+            retrieved: Optional retrieved chunks the analysis was based on
+        """
+        with self._lock:
+            self._entries[key] = {
+                "analysis": analysis,
+                "validation": validation,
+                "retrieved": retrieved or [],
+                "ts": time.time()
+            }
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,35 @@
+"""
+Prompt assembly for COREP analysis.
+Keeps the static instructions at the head of the prompt so provider-side
+prompt caching can reuse them across requests.
+"""
+
+from llm.prompts import (
+    COREP_SYSTEM_PROMPT,
+    ANALYSIS_INSTRUCTIONS,
+    create_corep_analysis_prompt
+)
+
+
+# Byte-identical across calls: system instructions, then task and output schema.
+# Nothing request-specific (timestamps, user input) may be added here.
+STATIC_PREFIX = COREP_SYSTEM_PROMPT + "\n" + ANALYSIS_INSTRUCTIONS
+
+
+def build_prompt(question: str, scenario: str, retrieved_rules: str) -> str:
+    """
+    Assemble the full prompt as static prefix + rules block + user block.
+    
+    Args:
+        question: User's question
+        scenario: Scenario description
+        retrieved_rules: Retrieved regulatory rule chunks
+        
+    Returns:
+        Complete prompt string
+    """
+    return STATIC_PREFIX + create_corep_analysis_prompt(
+        question=question,
+        scenario=scenario,
+        retrieved_rules=retrieved_rules
+    )
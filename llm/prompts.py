@@ -24,37 +24,10 @@ Key principles:
 """
 
 
-def create_corep_analysis_prompt(
-    question: str,
-    scenario: str,
-    retrieved_rules: str
-) -> str:
-    """
-    Create a prompt for COREP analysis with RAG context.
-    
-    Args:
-        question: User's question
-        scenario: Scenario description with numbers
-        retrieved_rules: Retrieved regulatory rule chunks
-        
-    Returns:
-        Formatted prompt string
-    """
-    prompt = f"""
-## USER QUESTION
-{question}
-
-## SCENARIO TO ANALYZE
-{scenario}
-
-## RELEVANT REGULATORY RULES
-The following rule excerpts have been retrieved from the regulatory documents:
-
-{retrieved_rules}
-
+ANALYSIS_INSTRUCTIONS = """
 ## YOUR TASK
 
-Based on the regulatory rules above and the scenario provided:
+Based on the regulatory rules and the scenario provided below:
 
 1. Identify each financial item mentioned in the scenario
 2. Determine the correct COREP template (e.g., C01.00)
@@ -67,27 +40,27 @@ Based on the regulatory rules above and the scenario provided:
 
 4. Output your analysis as JSON following this EXACT schema:
 
-{{
+{
   "template": "C01.00",
   "fields": [
-    {{
+    {
       "row": "010",
       "column": "010",
       "value": 10000000,
       "item_name": "Share capital",
       "justification": "Ordinary share capital qualifies as CET1 under Article 26 CRR...",
       "source": "Own Funds (CRR)_06-02-2026.pdf, page 15"
-    }},
-    {{
+    },
+    {
       "row": "030",
       "column": "010",
       "value": 2000000,
       "item_name": "Share premium",
       "justification": "Share premium accounts related to CET1 instruments...",
       "source": "Own Funds (CRR)_06-02-2026.pdf, page 16"
-    }}
+    }
   ]
-}}
+}
 
 ## IMPORTANT
 - Output ONLY the JSON object, no other text
@@ -96,12 +69,55 @@ Based on the regulatory rules above and the scenario provided:
 - Provide specific, detailed justifications with rule citations
 - Include source file name and page number for each justification
 """
-    return prompt
+
+
+# Request-specific part of the prompt; only these three fields vary per call
+ANALYSIS_REQUEST_TEMPLATE = """
+## RELEVANT REGULATORY RULES
+The following rule excerpts have been retrieved from the regulatory documents:
+
+{retrieved_rules}
+
+## USER QUESTION
+{question}
+
+## SCENARIO TO ANALYZE
+{scenario}
+"""
+
+
+def create_corep_analysis_prompt(
+    question: str,
+    scenario: str,
+    retrieved_rules: str
+) -> str:
+    """
+    Create the request-specific part of the COREP analysis prompt.
+    
+    Retrieved rules come first and the user's question and scenario last,
+    so that the static instructions (see llm.prompt_template.STATIC_PREFIX)
+    form an unchanging prompt head.
+    
+    Args:
+        question: User's question
+        scenario: Scenario description with numbers
+        retrieved_rules: Retrieved regulatory rule chunks
+        
+    Returns:
+        Formatted prompt string
+    """
+    return ANALYSIS_REQUEST_TEMPLATE.format(
+        retrieved_rules=retrieved_rules,
+        question=question,
+        scenario=scenario
+    )
 
 
 def create_json_schema() -> dict:
     """
-    Create JSON schema for function calling.
+    Create the JSON schema of an analysis result.
+    
+    Passed to Gemini as response_schema for constrained decoding.
     
     Returns:
         JSON schema dictionary
@@ -183,4 +199,5 @@ Common Equity Tier 1 capital includes ordinary share capital and related share p
     
     print("Generated Prompt:")
     print("=" * 80)
+    print(ANALYSIS_INSTRUCTIONS)
     print(prompt)
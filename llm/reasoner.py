@@ -3,17 +3,26 @@ LLM reasoning engine for COREP regulatory analysis.
 Uses Google Gemini API with structured JSON output.
 """
 
+import asyncio
+import hashlib
+import logging
 import os
 import json
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import google.generativeai as genai
 from dotenv import load_dotenv
 
-from llm.prompts import (
-    COREP_SYSTEM_PROMPT,
-    create_corep_analysis_prompt,
-    create_json_schema
-)
+from llm.prompt_template import build_prompt
+from llm.prompts import create_json_schema
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+log = logging.getLogger(__name__)
 
 
 # Load environment variables
@@ -26,7 +35,9 @@ class COREPReasoner:
     def __init__(self, 
                  api_key: Optional[str] = None,
                  model: str = "gemini-2.5-flash",
-                 temperature: float = 0.1):
+                 temperature: float = 0.1,
+                 cache_dir: Optional[str] = "data/llm_cache",
+                 cache_ttl: Optional[int] = 86400):
         """
         Initialize the reasoner.
         
@@ -34,6 +45,9 @@ class COREPReasoner:
             api_key: Google API key (or set GOOGLE_API_KEY env var)
             model: Gemini model to use
             temperature: Sampling temperature
+            cache_dir: Directory of the on-disk response cache (None or ""
+                disables it; needs the diskcache package)
+            cache_ttl: Seconds a cached response stays valid (None = forever)
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
         
@@ -45,10 +59,12 @@ class COREPReasoner:
         
         genai.configure(api_key=self.api_key)
         
-        # Create generation config (response_mime_type requires google-generativeai>=0.8.0)
+        # Constrain decoding to the analysis schema so the model can only emit
+        # valid, schema-shaped JSON (requires google-generativeai>=0.8.0)
         generation_config = genai.GenerationConfig(
             temperature=temperature,
-            response_mime_type="application/json"
+            response_mime_type="application/json",
+            response_schema=create_json_schema()
         )
         
         self.model = genai.GenerativeModel(
@@ -58,7 +74,11 @@ class COREPReasoner:
         self.model_name = model
         self.temperature = temperature
         
-        print(f"Initialized COREP Reasoner with model: {model}")
+        # Responses keyed by the full prompt, shared by every process using cache_dir
+        self.cache = diskcache.Cache(cache_dir) if diskcache is not None and cache_dir else None
+        self.cache_ttl = cache_ttl
+        
+        log.info("Initialized COREP Reasoner with model: %s", model)
     
     def analyze_scenario(self,
                         question: str,
@@ -75,41 +95,126 @@ class COREPReasoner:
         Returns:
             Structured analysis as dictionary
         """
-        # Create prompt
-        user_prompt = create_corep_analysis_prompt(
+        full_prompt, cache_key = self._prepare(question, scenario, retrieved_rules)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Call Gemini API with JSON mode
+        try:
+            response = self.model.generate_content(full_prompt)
+        except Exception as e:
+            log.debug("Error calling Gemini API: %s", e)
+            raise
+        
+        result = self._parse_response(response)
+        self._cache_set(cache_key, result)
+        return result
+    
+    async def analyze_scenario_async(self,
+                                     question: str,
+                                     scenario: str,
+                                     retrieved_rules: str) -> Dict:
+        """
+        Async variant of analyze_scenario().
+        
+        Awaits the Gemini call instead of blocking a thread on it, so an
+        event loop can overlap several analyses (e.g. with asyncio.gather)
+        or keep retrieving while a request is in flight. The on-disk cache
+        lookup and store run in a worker thread so sqlite I/O never stalls
+        the loop.
+        
+        Args:
+            question: User's question
+            scenario: Scenario description
+            retrieved_rules: Retrieved regulatory rules (formatted)
+            
+        Returns:
+            Structured analysis as dictionary
+        """
+        full_prompt, cache_key = self._prepare(question, scenario, retrieved_rules)
+        if cache_key is not None:
+            cached = await asyncio.to_thread(self._cache_get, cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            response = await self.model.generate_content_async(full_prompt)
+        except Exception as e:
+            log.debug("Error calling Gemini API: %s", e)
+            raise
+        
+        result = self._parse_response(response)
+        if cache_key is not None:
+            await asyncio.to_thread(self._cache_set, cache_key, result)
+        return result
+    
+    def _prepare(self,
+                 question: str,
+                 scenario: str,
+                 retrieved_rules: str) -> Tuple[str, Optional[str]]:
+        """
+        Build the prompt and its response cache key.
+        
+        Returns:
+            (full prompt, cache key or None when caching is off)
+        """
+        # Static instructions first, then retrieved rules, then the user's input
+        full_prompt = build_prompt(
             question=question,
             scenario=scenario,
             retrieved_rules=retrieved_rules
         )
         
-        # Combine system prompt and user prompt for Gemini
-        full_prompt = f"{COREP_SYSTEM_PROMPT}\n\n{user_prompt}"
+        if self.cache is None:
+            return full_prompt, None
         
-        # Call Gemini API with JSON mode
-        try:
-            response = self.model.generate_content(full_prompt)
+        return full_prompt, self._cache_key(full_prompt)
+    
+    def _cache_get(self, cache_key: Optional[str]) -> Optional[Dict]:
+        """Look up a cached response (blocking disk read)."""
+        if cache_key is None:
+            return None
+        return self.cache.get(cache_key)
+    
+    def _cache_set(self, cache_key: Optional[str], result: Dict) -> None:
+        """Store a response in the cache (blocking disk write)."""
+        if cache_key is not None:
+            self.cache.set(cache_key, result, expire=self.cache_ttl)
+    
+    def _parse_response(self, response) -> Dict:
+        """
+        Parse a Gemini JSON response and attach usage metadata.
+        
+        Args:
+            response: generate_content() response
             
-            # Parse JSON response
-            result_text = response.text
+        Returns:
+            Structured analysis as dictionary
+        """
+        result_text = response.text
+        try:
             result = json.loads(result_text)
-            
-            # Add metadata
-            result["metadata"] = {
-                "model": self.model_name,
-                "tokens_used": response.usage_metadata.total_token_count if hasattr(response, 'usage_metadata') else None,
-                "prompt_tokens": response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else None,
-                "completion_tokens": response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else None
-            }
-            
-            return result
-            
         except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {e}")
-            print(f"Raw response: {result_text}")
-            raise
-        except Exception as e:
-            print(f"Error calling Gemini API: {e}")
+            # Schema-constrained output only fails to parse if it was cut off
+            log.debug("Error parsing JSON response (truncated output?): %s", e)
+            log.debug("Raw response: %s", result_text)
             raise
+        
+        # Add metadata
+        result["metadata"] = {
+            "model": self.model_name,
+            "tokens_used": response.usage_metadata.total_token_count if hasattr(response, 'usage_metadata') else None,
+            "prompt_tokens": response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else None,
+            "completion_tokens": response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else None
+        }
+        
+        return result
+    
+    def _cache_key(self, prompt: str) -> str:
+        """Response cache key: model, temperature and a hash of the full prompt."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{self.temperature}:{digest}"
     
     def analyze_with_function_calling(self,
                                      question: str,
@@ -131,6 +236,22 @@ class COREPReasoner:
         return self.analyze_scenario(question, scenario, retrieved_rules)
 
 
+@lru_cache(maxsize=None)
+def get_reasoner(api_key: Optional[str] = None) -> COREPReasoner:
+    """
+    Return a shared reasoner per API key.
+    
+    Avoids reconfiguring genai and rebuilding the model client per call.
+    
+    Args:
+        api_key: Google API key (or GOOGLE_API_KEY env var)
+        
+    Returns:
+        Shared COREPReasoner
+    """
+    return COREPReasoner(api_key=api_key)
+
+
 def analyze_corep_scenario(question: str,
                           scenario: str,
                           retrieved_rules: str,
@@ -147,8 +268,7 @@ def analyze_corep_scenario(question: str,
     Returns:
         Analysis result
     """
-    reasoner = COREPReasoner(api_key=api_key)
-    return reasoner.analyze_scenario(question, scenario, retrieved_rules)
+    return get_reasoner(api_key).analyze_scenario(question, scenario, retrieved_rules)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+"""
+Semantic response cache for COREP analyses.
+Serves stored analyses for near-duplicate (question, scenario) pairs.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import faiss
+import numpy as np
+
+
+# Amounts in a query ("10m", "0.5 bn", "2,500,000", "8%"). Sentence embeddings
+# barely move when only these change, so hits must match them exactly
+NUMBER_TOKEN = re.compile(
+    r"\d+(?:[.,]\d+)*(?:\s*(?:bn|billion|mn|million|m|k|thousand)\b|\s*%)?",
+    re.IGNORECASE
+)
+
+# Nearest neighbours inspected per lookup for one whose fingerprint matches
+GUARD_CANDIDATES = 8
+
+
+class SemanticCache:
+    """Caches analyses keyed on the embedding of the user's query."""
+    
+    def __init__(self,
+                 embedder,
+                 threshold: float = 0.92,
+                 ttl: int = 3600,
+                 max_entries: int = 500):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            embedder: SentenceTransformer used to embed queries (e.g. retriever.model)
+            threshold: Minimum cosine similarity for a cache hit
+            ttl: Seconds before an entry expires
+            max_entries: Maximum number of cached analyses (LRU eviction)
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        
+        self._index = None
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    def embed(self, question: str, scenario: str) -> np.ndarray:
+        """
+        Embed a (question, scenario) pair as a normalized vector.
+        
+        Args:
+            question: User question
+            scenario: Scenario description
+        
+        Returns:
+            Array of shape (1, dim)
+        """
+        vec = self.embedder.encode([self.cache_text(question, scenario)], convert_to_numpy=True)
+        return self._normalize(vec)
+    
+    @staticmethod
+    def cache_text(question: str, scenario: str) -> str:
+        """
+        Build the text embedded for a (question, scenario) pair.
+        
+        Callers that embed with their own encoder encode this text and pass
+        the vector straight to get()/put().
+        
+        Args:
+            question: User question
+            scenario: Scenario description
+        
+        Returns:
+            Text to embed
+        """
+        return f"{question}\n{scenario}"
+    
+    @staticmethod
+    def fingerprint(question: str, scenario: str, top_k: int) -> Tuple:
+        """
+        Exact-match guard for a (question, scenario, top_k) request.
+        
+        A semantic hit is only served when this matches: the numeric
+        tokens of the question and scenario, in order, plus top_k. Two
+        scenarios that differ only in their amounts embed almost
+        identically but need different answers.
+        
+        Args:
+            question: User question
+            scenario: Scenario description
+            top_k: Number of retrieved chunks
+        
+        Returns:
+            Hashable fingerprint
+        """
+        numbers = tuple(
+            "".join(token.split()).lower()
+            for token in NUMBER_TOKEN.findall(f"{question}\n{scenario}")
+        )
+        return (top_k, numbers)
+    
+    def get(self, vec: np.ndarray, fingerprint: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up the closest cached analysis with a matching fingerprint.
+        
+        Args:
+            vec: Query embedding from embed()
+            fingerprint: Value of fingerprint() for the request
+        
+        Returns:
+            Cached entry with 'analysis', 'validation' and 'similarity', or None on miss
+        """
+        vec = self._normalize(vec)
+        
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return None
+            
+            k = min(GUARD_CANDIDATES, self._index.ntotal)
+            scores, ids = self._index.search(vec, k)
+            now = time.time()
+            
+            for score, entry_id in zip(scores[0], ids[0]):
+                entry_id = int(entry_id)
+                if entry_id < 0 or score < self.threshold:
+                    break
+                
+                entry = self._entries[entry_id]
+                if now - entry["ts"] > self.ttl:
+                    self._evict(entry_id)
+                    continue
+                
+                if entry["fingerprint"] != fingerprint:
+                    continue
+                
+                self._entries.move_to_end(entry_id)
+                return {**entry, "similarity": float(score)}
+            
+            return None
+    
+    def put(self,
+            vec: np.ndarray,
+            analysis: Dict,
+            validation: Any,
+            prompt: str = "",
+            retrieved: Optional[List[Dict]] = None,
+            fingerprint: Optional[Tuple] = None) -> None:
+        """
+        Store an analysis for a query embedding.
+        
+        Args:
+            vec: Query embedding from embed()
+            analysis: LLM analysis result
+            validation: Validation result served alongside the analysis
+            prompt: Optional prompt text kept for inspection
+            retrieved: Optional retrieved chunks the analysis was based on
+            fingerprint: Value of fingerprint() for the request
+        """
+        vec = self._normalize(vec)
+        
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap(faiss.IndexFlatIP(vec.shape[1]))
+            
+            while len(self._entries) >= self.max_entries:
+                self._evict(next(iter(self._entries)))
+            
+            entry_id = self._next_id
+            self._next_id += 1
+            
+            self._index.add_with_ids(vec, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = {
+                "prompt": prompt,
+                "analysis": analysis,
+                "validation": validation,
+                "retrieved": retrieved or [],
+                "fingerprint": fingerprint,
+                "ts": time.time()
+            }
+    
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._index = None
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def _evict(self, entry_id: int) -> None:
+        """Remove a single entry from the index and the entry table (lock held)."""
+        self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+        del self._entries[entry_id]
+    
+    @staticmethod
+    def _normalize(vec: np.ndarray) -> np.ndarray:
+        """L2-normalize so inner product equals cosine similarity."""
+        vec = np.ascontiguousarray(vec, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(vec)
+        return vec
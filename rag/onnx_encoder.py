@@ -0,0 +1,128 @@
+"""
+ONNX Runtime query encoder for sentence-transformers models.
+Runs an exported, int8-quantized copy of the embedding model on CPU.
+"""
+
+import logging
+from pathlib import Path
+from typing import List
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+log = logging.getLogger(__name__)
+
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = True) -> Path:
+    """
+    Export a sentence-transformers model to ONNX (and int8-quantize it).
+    
+    Needs optimum[onnxruntime]; only run at ingestion time.
+    
+    Args:
+        model_name: SentenceTransformer model name (e.g. all-MiniLM-L6-v2)
+        output_dir: Directory for the ONNX model and tokenizer files
+        quantize: Also write a dynamically int8-quantized model
+    
+    Returns:
+        Output directory
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+    
+    hub_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    output_dir = Path(output_dir)
+    
+    ORTModelForFeatureExtraction.from_pretrained(hub_name, export=True).save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(hub_name).save_pretrained(output_dir)
+    
+    if quantize:
+        quantize_dynamic(
+            str(output_dir / MODEL_FILE),
+            str(output_dir / QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+    
+    log.info("Exported ONNX model for %s to %s", model_name, output_dir)
+    return output_dir
+
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode() backed by ONNX Runtime."""
+    
+    def __init__(self, model_dir: str, max_length: int = 256):
+        """
+        Load the exported model and tokenizer.
+        
+        Args:
+            model_dir: Directory written by export_onnx_model()
+            max_length: Maximum tokens per text (MiniLM was trained on 256)
+        """
+        from transformers import AutoTokenizer
+        
+        model_dir = Path(model_dir)
+        model_path = model_dir / QUANTIZED_MODEL_FILE
+        if not model_path.exists():
+            model_path = model_dir / MODEL_FILE
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_length = max_length
+        
+        log.info("Loaded ONNX encoder: %s", model_path)
+    
+    def encode(self,
+               texts: List[str],
+               batch_size: int = 32,
+               convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embed texts with mean pooling and L2 normalization.
+        
+        all-MiniLM-L6-v2 ends in a Normalize layer, so outputs are always
+        unit length, matching SentenceTransformer.encode() for that model.
+        
+        Args:
+            texts: Texts to embed
+            batch_size: Texts per ONNX Runtime call
+            convert_to_numpy: Accepted for compatibility (always numpy)
+            normalize_embeddings: Accepted for compatibility (always normalized)
+            show_progress_bar: Accepted for compatibility (ignored)
+        
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        batches = []
+        
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            hidden = self.session.run(None, feeds)[0]
+            
+            # Mean over real (non-padding) tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        
+        embeddings = np.concatenate(batches).astype(np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
@@ -3,32 +3,113 @@ RAG retriever for semantic search over COREP regulatory documents.
 Uses FAISS for vector similarity search.
 """
 
+import logging
 import pickle
+import re
+import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from rag.onnx_encoder import OnnxEncoder, ort
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+
+log = logging.getLogger(__name__)
+
+
+# Control and zero-width characters that change the token sequence but not
+# the meaning (whitespace controls are handled by the whitespace collapse)
+NON_PRINTABLE = re.compile(r"[\x00-\x08\x0e-\x1f\x7f-\x9f\u200b-\u200f\u2060\ufeff]")
+
+
+@lru_cache(maxsize=1)
+def _get_cl100k():
+    """Load the cl100k_base tokenizer once per process (for prompt budgets)."""
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+
+# One retrieved chunk as it appears in the LLM prompt
+CHUNK_TEMPLATE = """
+[CHUNK {i}]
+Source: {source}
+Page: {page}
+Relevance Score: {score:.4f}
+
+Content:
+{text}
+
+---
+"""
+
 
 class RAGRetriever:
     """Retrieves relevant document chunks using semantic search."""
     
-    def __init__(self, data_dir: str = "data"):
+    # FAISS candidates fetched per requested result when deduplicating pages
+    DEDUP_OVERFETCH = 3
+    
+    def __init__(self,
+                 data_dir: str = "data",
+                 cache_size: int = 256,
+                 embed_cache_size: int = 1024,
+                 ef_search: int = 64,
+                 nprobe: int = 8,
+                 device: Optional[str] = None,
+                 onnx_dir: Optional[str] = None,
+                 dedup_pages: bool = True):
         """
         Initialize the retriever.
         
         Args:
             data_dir: Directory containing FAISS index and metadata
+            cache_size: Number of queries whose results and prompt text are memoized
+            embed_cache_size: Number of query embeddings memoized
+            ef_search: HNSW candidate list size at query time (recall vs. speed)
+            nprobe: IVF lists scanned per query (recall vs. speed)
+            device: Torch device for the query encoder (defaults to CUDA
+                when available, else CPU)
+            onnx_dir: Exported ONNX model directory; when present, CPU query
+                encoding runs on ONNX Runtime instead of PyTorch
+            dedup_pages: Return at most one chunk per (source file, page);
+                overlapping chunks of one page otherwise repeat in prompts
         """
         self.data_dir = Path(data_dir)
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.device = device or self._default_device()
+        self.onnx_dir = Path(onnx_dir) if onnx_dir else None
+        self.dedup_pages = dedup_pages
         self.index_path = self.data_dir / "index.faiss"
-        self.metadata_path = self.data_dir / "metadata.pkl"
+        self.metadata_path = self.data_dir / "metadata.parquet"
+        self.legacy_metadata_path = self.data_dir / "metadata.pkl"
         
-        # Load index and metadata
+        self._model = None
+        self._model_lock = threading.Lock()
+        
+        # Load index and metadata (the embedding model loads lazily)
         self._load_index()
         self._load_metadata()
         
+        # Per-instance memoization of query embeddings, results and prompt text.
+        # Vectors from a batched encode are parked in _seeds so the memoized
+        # path picks them up instead of encoding again
+        self._seeds: Dict[str, np.ndarray] = {}
+        self._embed_cached = lru_cache(maxsize=embed_cache_size)(self._encode_query)
+        self._retrieve_cached = lru_cache(maxsize=cache_size)(self._search)
+        self._format_cached = lru_cache(maxsize=cache_size)(self._format_chunks)
+        
     def _load_index(self) -> None:
         """Load FAISS index from disk."""
         if not self.index_path.exists():
@@ -37,66 +118,393 @@ class RAGRetriever:
                 f"Please run the embedding pipeline first."
             )
         
-        self.index = faiss.read_index(str(self.index_path))
-        print(f"Loaded FAISS index with {self.index.ntotal} vectors")
+        # Memory-map the stored vectors so pages load on demand and are shared
+        # through the OS page cache by every process serving the same index;
+        # index types that can't be mapped are read into memory as before
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            self.index = faiss.read_index(str(self.index_path), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            self.index = faiss.read_index(str(self.index_path))
+        
+        # Legacy builds used a flat L2 index; re-home its vectors in an
+        # inner-product index so scores are cosine similarities (higher is
+        # better) and each comparison is a single dot product
+        if isinstance(self.index, faiss.IndexFlatL2):
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+            faiss.normalize_L2(vectors)
+            self.index = faiss.IndexFlatIP(self.index.d)
+            self.index.add(vectors)
+        
+        # Inner-product indexes hold normalized vectors; queries must match
+        self.normalize_queries = self.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        self._configure_search()
+        
+        if self.device.startswith("cuda"):
+            self._move_index_to_gpu()
+        
+        log.info("Loaded FAISS index with %d vectors", self.index.ntotal)
+    
+    @staticmethod
+    def _default_device() -> str:
+        """CUDA when a GPU is visible to torch, else CPU."""
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    
+    def _move_index_to_gpu(self) -> None:
+        """Clone the index to GPU 0 when faiss-gpu is installed and supports its type."""
+        if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+            return
+        
+        try:
+            # Store vectors as fp16 on the device, matching the half-precision encoder
+            options = faiss.GpuClonerOptions()
+            options.useFloat16 = True
+            
+            self._gpu_resources = faiss.StandardGpuResources()
+            self.index = faiss.index_cpu_to_gpu(self._gpu_resources, 0, self.index, options)
+            log.info("FAISS index moved to GPU")
+        except RuntimeError as e:
+            # e.g. HNSW has no GPU implementation; keep searching on CPU
+            log.info("Keeping FAISS index on CPU: %s", e)
+    
+    def _configure_search(self) -> None:
+        """Apply query-time search parameters to HNSW and IVF indexes."""
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap):
+            index = faiss.downcast_index(index.index)
+        
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.ef_search
+        
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(self.nprobe, ivf.nlist)
         
     def _load_metadata(self) -> None:
-        """Load metadata from disk."""
-        if not self.metadata_path.exists():
+        """Load metadata from disk (Parquet, or the legacy pickle)."""
+        self._sorted_ids = None
+        
+        if pq is not None and self.metadata_path.exists():
+            # Chunks stay in a memory-mapped, columnar Arrow table; only the
+            # rows a search returns are turned into Python objects
+            table = pq.read_table(self.metadata_path, memory_map=True)
+            
+            # ID-mapped indexes return chunk vector ids; keep them sorted with
+            # their row numbers so a search's ids map back with searchsorted
+            if "vector_id" in table.column_names:
+                vector_ids = table.column("vector_id").to_numpy()
+                order = np.argsort(vector_ids)
+                self._sorted_ids = vector_ids[order]
+                self._id_rows = order
+                table = table.drop(["vector_id"])
+            
+            self.table = table
+            self.num_chunks = table.num_rows
+            self.model_name = table.schema.metadata[b"model_name"].decode("utf-8")
+        
+        elif self.legacy_metadata_path.exists():
+            with open(self.legacy_metadata_path, "rb") as f:
+                data = pickle.load(f)
+            
+            self.table = None
+            self.texts = data["texts"]
+            self.metadata = data["metadata"]
+            self.num_chunks = len(self.texts)
+            self.model_name = data["model_name"]
+            
+            # Row-wise loading creates one string per chunk; share them per file
+            for meta in self.metadata:
+                meta["source_file"] = sys.intern(meta["source_file"])
+        
+        else:
             raise FileNotFoundError(
                 f"Metadata not found at {self.metadata_path}. "
                 f"Please run the embedding pipeline first."
             )
         
-        with open(self.metadata_path, "rb") as f:
-            data = pickle.load(f)
-        
-        self.chunks = data["chunks"]
-        self.texts = data["texts"]
-        self.metadata = data["metadata"]
-        self.model_name = data["model_name"]
+        log.info("Loaded %d chunks", self.num_chunks)
+    
+    @property
+    def model(self):
+        """Query encoder, loaded on first use so metadata-only callers skip it."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+    
+    def _load_model(self):
+        """Load the query encoder for the index's embedding model."""
+        # An exported int8 ONNX copy is much cheaper per query on CPU than
+        # the PyTorch model
+        if self._use_onnx():
+            return OnnxEncoder(str(self.onnx_dir))
         
-        print(f"Loaded {len(self.chunks)} chunks")
+        log.info("Loading embedding model: %s (%s)", self.model_name, self.device)
+        model = SentenceTransformer(self.model_name, device=self.device)
         
-        # Load embedding model
-        print(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
+        # Half precision halves activation traffic on GPU; CPUs stay in fp32
+        if self.device.startswith("cuda"):
+            model.half()
         
+        return model
+    
+    def _use_onnx(self) -> bool:
+        """Whether query encoding should run on the exported ONNX model."""
+        return (
+            self.onnx_dir is not None
+            and self.onnx_dir.is_dir()
+            and ort is not None
+            and self.device == "cpu"
+        )
+    
     def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
         """
         Retrieve top-k most relevant chunks for a query.
         
+        Results are memoized per (query, top_k); the query embedding is
+        memoized per query so a repeat with a different top_k only re-runs
+        the FAISS search. Queries differing only in case or whitespace
+        share cache entries.
+        
         Args:
             query: Search query
             top_k: Number of results to return
             
+        Returns:
+            List of dictionaries with text, metadata, and similarity score
+            (inner product of normalized vectors; higher is more similar)
+        """
+        return list(self._retrieve_cached(self._query_key(query), top_k))
+    
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a query with the retriever's model (memoized per text).
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Array of shape (1, dim)
+        """
+        return self._embed_cached(self._query_key(text))
+    
+    def embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed several texts in a single model forward pass.
+        
+        Texts are normalized like embed() and the vectors are stored in the
+        embedding memo, so later embed()/retrieve() calls for the same text
+        reuse them.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One array of shape (1, dim) per text, in input order
+        """
+        keys = [self._query_key(text) for text in texts]
+        embeddings = self._encode(keys)
+        return [self._seed_embedding(key, embeddings[i:i + 1]) for i, key in enumerate(keys)]
+    
+    def retrieve_with_vec(self,
+                          query_embedding: np.ndarray,
+                          top_k: int = 5,
+                          query: Optional[str] = None) -> List[Dict]:
+        """
+        Retrieve top-k chunks for a precomputed query embedding.
+        
+        Skips the encode step for callers that already embedded the query
+        (e.g. with embed_batch()). When the query text is given, results
+        go through the same memo as retrieve().
+        
+        Args:
+            query_embedding: Embedding from embed() or embed_batch()
+            top_k: Number of results to return
+            query: Query text the embedding was computed from
+            
         Returns:
             List of dictionaries with text, metadata, and similarity score
         """
-        # Generate query embedding
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
+        if query is None:
+            return list(self._search_vec(query_embedding, top_k))
+        
+        key = self._query_key(query)
+        self._seeds[key] = query_embedding
+        try:
+            return list(self._retrieve_cached(key, top_k))
+        finally:
+            self._seeds.pop(key, None)
+    
+    def retrieve_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Retrieve top-k chunks for several queries at once.
+        
+        All queries are encoded in one model call and searched with a
+        single FAISS call over the stacked embeddings.
         
-        # Search FAISS index
-        distances, indices = self.index.search(query_embedding, top_k)
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+            
+        Returns:
+            One result list per query, in input order
+        """
+        if not queries:
+            return []
+        
+        embeddings = self._encode([self._query_key(query) for query in queries])
+        return [list(results) for results in self._search_matrix(embeddings, top_k)]
+    
+    @staticmethod
+    def _query_key(query: str) -> str:
+        """
+        Cache key for a query: non-printables dropped, whitespace collapsed
+        and lowercased.
+        
+        The embedding model is uncased and ignores runs of whitespace, so
+        the key is also safe to encode in place of the raw query, and its
+        tokenizer sees a shorter, canonical input.
+        """
+        return " ".join(NON_PRINTABLE.sub("", query).split()).lower()
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts straight into the layout FAISS searches.
+        
+        The model normalizes on its side when the index needs it, so the
+        float32, C-contiguous output reaches index.search() without another
+        copy or normalization pass.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Array of shape (len(texts), dim)
+        """
+        embeddings = self.model.encode(
+            texts,
+            batch_size=32,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize_queries
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Generate the embedding for a single query (shared, so read-only)."""
+        embedding = self._seeds.pop(query, None)
+        if embedding is None:
+            embedding = self._encode([query])
+        embedding = np.ascontiguousarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        return embedding
+    
+    def _seed_embedding(self, key: str, embedding: np.ndarray) -> np.ndarray:
+        """Memoize an already computed embedding for a normalized query key."""
+        self._seeds[key] = embedding
+        try:
+            return self._embed_cached(key)
+        finally:
+            self._seeds.pop(key, None)
+    
+    def _search(self, query: str, top_k: int) -> Tuple[Dict, ...]:
+        """Run the FAISS search for a query (uncached)."""
+        return self._search_vec(self._embed_cached(query), top_k)
+    
+    def _search_vec(self, query_embedding: np.ndarray, top_k: int) -> Tuple[Dict, ...]:
+        """Run the FAISS search for a query embedding."""
+        return self._search_matrix(query_embedding, top_k)[0]
+    
+    def _search_matrix(self, embeddings: np.ndarray, top_k: int) -> List[Tuple[Dict, ...]]:
+        """Run one FAISS search over a (n, dim) matrix of query embeddings."""
+        # Embeddings from _encode() pass through as-is; others are converted
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1, self.index.d)
+        
+        # Search FAISS index, over-fetching so dropped duplicates can be
+        # replaced by the next-best distinct pages
+        fetch_k = top_k * self.DEDUP_OVERFETCH if self.dedup_pages else top_k
+        scores, indices = self.index.search(embeddings, fetch_k)
+        if self._sorted_ids is not None:
+            indices = self._ids_to_rows(indices)
         
         # Prepare results
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(self.chunks):
-                result = {
-                    "text": self.texts[idx],
-                    "metadata": self.metadata[idx],
-                    "similarity_score": float(distance),
-                    "rank": len(results) + 1
+        all_results = []
+        for row_indices, row_scores in zip(indices, scores):
+            hits = [
+                (int(idx), float(score))
+                for idx, score in zip(row_indices, row_scores)
+                if 0 <= idx < self.num_chunks
+            ]
+            chunks = self._get_chunks([idx for idx, _ in hits])
+            
+            if self.dedup_pages:
+                hits, chunks = self._dedup_pages(hits, chunks, top_k)
+            
+            all_results.append(tuple(
+                {
+                    "text": text,
+                    "metadata": metadata,
+                    "similarity_score": score,
+                    "rank": rank,
+                    "chunk_id": idx
                 }
-                results.append(result)
+                for rank, ((idx, score), (text, metadata)) in enumerate(zip(hits, chunks), 1)
+            ))
+        
+        return all_results
+    
+    @staticmethod
+    def _dedup_pages(hits: List[Tuple[int, float]],
+                     chunks: List[Tuple[str, Dict]],
+                     top_k: int) -> Tuple[List[Tuple[int, float]], List[Tuple[str, Dict]]]:
+        """Keep the best-scoring hit per (source file, page), up to top_k."""
+        seen = set()
+        kept_hits, kept_chunks = [], []
+        
+        for hit, chunk in zip(hits, chunks):
+            key = (chunk[1]["source_file"], chunk[1]["page"])
+            if key in seen:
+                continue
+            
+            seen.add(key)
+            kept_hits.append(hit)
+            kept_chunks.append(chunk)
+            if len(kept_hits) == top_k:
+                break
+        
+        return kept_hits, kept_chunks
+    
+    def _ids_to_rows(self, ids: np.ndarray) -> np.ndarray:
+        """Map FAISS vector ids to table rows (-1 where unknown)."""
+        if len(self._sorted_ids) == 0:
+            return np.full_like(ids, -1)
         
-        return results
+        pos = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[pos] == ids, self._id_rows[pos], -1)
+    
+    def _get_chunks(self, rows: List[int]) -> List[Tuple[str, Dict]]:
+        """
+        Fetch (text, metadata) for table rows.
+        
+        Args:
+            rows: Row numbers, in the order wanted
+            
+        Returns:
+            One (text, metadata) pair per row
+        """
+        if self.table is None:
+            return [(self.texts[row], self.metadata[row]) for row in rows]
+        
+        records = self.table.take(pa.array(rows, type=pa.int64())).to_pylist()
+        return [(record.pop("text"), record) for record in records]
     
     def retrieve_with_context(self, 
                              query: str, 
                              top_k: int = 5,
-                             include_summary: bool = True) -> Dict:
+                             include_summary: bool = True,
+                             max_context_tokens: Optional[int] = None) -> Dict:
         """
         Retrieve chunks with additional context information.
         
@@ -104,12 +512,17 @@ class RAGRetriever:
             query: Search query
             top_k: Number of results
             include_summary: Include summary statistics
+            max_context_tokens: Optional token budget for the returned chunks
             
         Returns:
             Dictionary with results and metadata
         """
         results = self.retrieve(query, top_k)
         
+        truncated = 0
+        if max_context_tokens is not None:
+            results, truncated = self._fit_token_budget(results, max_context_tokens)
+        
         response = {
             "query": query,
             "top_k": top_k,
@@ -119,45 +532,130 @@ class RAGRetriever:
         
         if include_summary:
             # Add summary statistics
-            sources = set(r["metadata"]["source_file"] for r in results)
-            pages = set(r["metadata"]["page"] for r in results)
+            sources, pages = self._summarize_sources(results)
             
             response["summary"] = {
                 "unique_sources": len(sources),
                 "unique_pages": len(pages),
-                "source_files": list(sources),
-                "page_numbers": sorted(pages)
+                "source_files": sources,
+                "page_numbers": pages,
+                "truncated_chunks": truncated
             }
         
         return response
     
-    def format_for_llm(self, results: List[Dict]) -> str:
+    def _summarize_sources(self, results: List[Dict]) -> Tuple[List[str], List[int]]:
+        """
+        Distinct source files and pages across results.
+        
+        With the Arrow table the columns are gathered and deduplicated in
+        C (take + unique) rather than by walking result dicts.
+        
+        Args:
+            results: Retrieval results
+            
+        Returns:
+            (source files, sorted page numbers)
+        """
+        if self.table is None:
+            sources = set(r["metadata"]["source_file"] for r in results)
+            pages = set(r["metadata"]["page"] for r in results)
+            return list(sources), sorted(pages)
+        
+        rows = pa.array([r["chunk_id"] for r in results], type=pa.int64())
+        sources = pc.unique(self.table.column("source_file").take(rows))
+        pages = pc.unique(self.table.column("page").take(rows))
+        return sources.to_pylist(), sorted(pages.to_pylist())
+    
+    def format_for_llm(self, results: List[Dict], max_tokens: Optional[int] = None) -> str:
         """
         Format retrieved chunks for LLM consumption.
         
         Args:
-            results: List of retrieval results
+            results: List of retrieval results (best first)
+            max_tokens: Optional token budget for the chunk texts; lower-ranked
+                chunks that don't fit are left out
             
         Returns:
             Formatted string for LLM prompt
         """
-        formatted_chunks = []
+        if max_tokens is not None:
+            results, _ = self._fit_token_budget(results, max_tokens)
         
-        for i, result in enumerate(results, 1):
-            chunk_text = f"""
-[CHUNK {i}]
-Source: {result['metadata']['source_file']}
-Page: {result['metadata']['page']}
-Relevance Score: {result['similarity_score']:.4f}
+        if all("chunk_id" in r for r in results):
+            key = tuple((r["chunk_id"], r["similarity_score"]) for r in results)
+            return self._format_cached(key)
+        
+        return self._format_chunks_from_results(results)
+    
+    @staticmethod
+    def _fit_token_budget(results: List[Dict], max_tokens: int) -> Tuple[List[Dict], int]:
+        """
+        Keep the best-ranked results whose texts fit in a token budget.
+        
+        Stops at the first result that would overflow the budget; the top
+        result is always kept so the prompt never loses all context. Uses
+        the chunk_tokens count stored at ingestion, tokenizing only chunks
+        that lack it.
+        
+        Args:
+            results: Retrieval results, best first
+            max_tokens: Token budget (cl100k_base, close enough for Gemini)
+            
+        Returns:
+            (kept results, number of results dropped)
+        """
+        total = 0
+        
+        for i, result in enumerate(results):
+            n_tokens = result["metadata"].get("chunk_tokens")
+            if n_tokens is None:
+                n_tokens = len(_get_cl100k().encode_ordinary(result["text"]))
+            
+            total += n_tokens
+            if total > max_tokens and i > 0:
+                return results[:i], len(results) - i
+        
+        return results, 0
+    
+    def _format_chunks(self, key: Tuple[Tuple[int, float], ...]) -> str:
+        """Format chunks identified by (chunk_id, similarity_score) pairs."""
+        chunks = self._get_chunks([chunk_id for chunk_id, _ in key])
+        results = [
+            {"text": text, "metadata": metadata, "similarity_score": score}
+            for (text, metadata), (_, score) in zip(chunks, key)
+        ]
+        return self._format_chunks_from_results(results)
+    
+    def _format_chunks_from_results(self, results: List[Dict]) -> str:
+        """Build the prompt text for a list of retrieval results."""
+        return "\n".join(
+            CHUNK_TEMPLATE.format(
+                i=i,
+                source=result["metadata"]["source_file"],
+                page=result["metadata"]["page"],
+                score=result["similarity_score"],
+                text=result["text"]
+            )
+            for i, result in enumerate(results, 1)
+        )
 
-Content:
-{result['text']}
 
----
-"""
-            formatted_chunks.append(chunk_text)
+@lru_cache(maxsize=None)
+def get_retriever(data_dir: str = "data") -> RAGRetriever:
+    """
+    Return the process-wide retriever for a data directory.
+    
+    The index, metadata and embedding model are loaded on the first call
+    only; later calls reuse the same instance (and its query caches).
+    
+    Args:
+        data_dir: Data directory
         
-        return "\n".join(formatted_chunks)
+    Returns:
+        Shared RAGRetriever
+    """
+    return RAGRetriever(data_dir=data_dir)
 
 
 def retrieve_relevant_rules(query: str, top_k: int = 5, data_dir: str = "data") -> List[Dict]:
@@ -172,8 +670,7 @@ def retrieve_relevant_rules(query: str, top_k: int = 5, data_dir: str = "data")
     Returns:
         List of retrieval results
     """
-    retriever = RAGRetriever(data_dir=data_dir)
-    return retriever.retrieve(query, top_k)
+    return get_retriever(data_dir).retrieve(query, top_k)
 
 
 if __name__ == "__main__":
@@ -107,9 +107,9 @@ def check_index_exists():
     print("\nChecking FAISS index...")
     
     index_path = Path("data/index.faiss")
-    metadata_path = Path("data/metadata.pkl")
+    metadata_paths = [Path("data/metadata.parquet"), Path("data/metadata.pkl")]
     
-    if index_path.exists() and metadata_path.exists():
+    if index_path.exists() and any(p.exists() for p in metadata_paths):
         print("✓ FAISS index found")
         return True
     else:
@@ -3,13 +3,36 @@ COREP template mapper - maps LLM output to Excel templates.
 Creates DataFrames and exports to Excel format.
 """
 
+import numpy as np
 import pandas as pd
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from typing import BinaryIO, Dict, List, Optional, Union
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
 from datetime import datetime
 
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import pyexcelerate
+except ImportError:
+    pyexcelerate = None
+
+
+# openpyxl styles are immutable, so build them once and share them. Colours
+# are full ARGB: openpyxl pads 6-digit RGB with a 00 (transparent) alpha
+HEADER_FILL = PatternFill(start_color="FF4472C4", end_color="FF4472C4", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFFFF")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+NUMBER_ALIGNMENT = Alignment(horizontal="right")
+NUMBER_FORMAT = "#,##0"
+
 
 class COREPTemplateMapper:
     """Maps analysis results to COREP Excel templates."""
@@ -43,14 +66,34 @@ class COREPTemplateMapper:
         }
     }
     
-    def __init__(self, template_code: str = "C01.00"):
+    # Template codes in sheet order and their array positions
+    C0100_ROWS = list(C0100_STRUCTURE["rows"])
+    C0100_COLUMNS = list(C0100_STRUCTURE["columns"])
+    C0100_ROW_INDEX = {code: i for i, code in enumerate(C0100_ROWS)}
+    C0100_COLUMN_INDEX = {code: i for i, code in enumerate(C0100_COLUMNS)}
+    
+    # Field count above which the Details sheet is streamed (openpyxl
+    # write-only) rather than assembled in memory by pyexcelerate
+    STREAMING_FIELD_THRESHOLD = 5000
+    
+    def __init__(self, template_code: str = "C01.00", engine: str = "pyexcelerate"):
         """
         Initialize the mapper.
         
         Args:
             template_code: COREP template code
+            engine: Excel writer backend ("pyexcelerate", "openpyxl" or
+                "xlsxwriter")
         """
         self.template_code = template_code
+        self.engine = engine
+        
+        if engine == "xlsxwriter" and xlsxwriter is None:
+            print("Warning: xlsxwriter not installed, falling back to openpyxl")
+            self.engine = "openpyxl"
+        elif engine == "pyexcelerate" and pyexcelerate is None:
+            print("Warning: pyexcelerate not installed, falling back to openpyxl")
+            self.engine = "openpyxl"
         
     def create_dataframe_from_analysis(self, analysis: Dict) -> pd.DataFrame:
         """
@@ -62,27 +105,18 @@ class COREPTemplateMapper:
         Returns:
             Pandas DataFrame
         """
-        # Initialize empty template structure
-        rows = list(self.C0100_STRUCTURE["rows"].keys())
-        columns = list(self.C0100_STRUCTURE["columns"].keys())
-        
-        # Create empty DataFrame
-        df = pd.DataFrame(index=rows, columns=columns)
-        df.index.name = "Row"
+        # Fill a zeroed array by position, then wrap it once
+        values = np.zeros((len(self.C0100_ROWS), len(self.C0100_COLUMNS)), dtype=np.float64)
         
-        # Fill with zeros
-        df = df.fillna(0).infer_objects(copy=False)
-        
-        # Populate from analysis
-        if "fields" in analysis:
-            for field in analysis["fields"]:
-                row_code = field.get("row")
-                col_code = field.get("column")
-                value = field.get("value", 0)
-                
-                if row_code in df.index and col_code in df.columns:
-                    df.loc[row_code, col_code] = value
+        for field in analysis.get("fields", []):
+            row_idx = self.C0100_ROW_INDEX.get(field.get("row"))
+            col_idx = self.C0100_COLUMN_INDEX.get(field.get("column"))
+            
+            if row_idx is not None and col_idx is not None:
+                values[row_idx, col_idx] = field.get("value") or 0
         
+        df = pd.DataFrame(values, index=self.C0100_ROWS, columns=self.C0100_COLUMNS)
+        df.index.name = "Row"
         return df
     
     def create_detailed_table(self, analysis: Dict) -> pd.DataFrame:
@@ -95,113 +129,269 @@ class COREPTemplateMapper:
         Returns:
             DataFrame with labels and values
         """
-        rows_data = []
-        
-        if "fields" in analysis:
-            for field in analysis["fields"]:
-                row_data = {
-                    "Row": field.get("row"),
-                    "Column": field.get("column"),
-                    "Item": field.get("item_name", ""),
-                    "Value": field.get("value", 0),
-                    "Justification": field.get("justification", ""),
-                    "Source": field.get("source", "")
-                }
-                rows_data.append(row_data)
-        
-        df = pd.DataFrame(rows_data)
+        fields = analysis.get("fields", [])
+        
+        # One list per column, so pandas builds each column in one go
+        df = pd.DataFrame({
+            "Row": [field.get("row") for field in fields],
+            "Column": [field.get("column") for field in fields],
+            "Item": [field.get("item_name", "") for field in fields],
+            "Value": np.asarray([field.get("value") or 0 for field in fields], dtype=np.float64),
+            "Justification": [field.get("justification", "") for field in fields],
+            "Source": [field.get("source", "") for field in fields]
+        })
         return df
     
     def export_to_excel(self, 
                        analysis: Dict,
-                       output_path: str,
-                       include_details: bool = True) -> str:
+                       output_path: Union[str, BinaryIO],
+                       include_details: bool = True) -> Union[str, BinaryIO]:
         """
         Export analysis to formatted Excel file.
         
+        pyexcelerate hands each sheet over as one block of rows and
+        serializes it with the least per-cell Python work; openpyxl
+        (write-only mode) and xlsxwriter (constant-memory mode) stream rows
+        in order with bounded memory.
+        
         Args:
             analysis: Analysis dictionary
-            output_path: Path for output Excel file
+            output_path: Path for output Excel file, or a writable binary
+                file-like object (e.g. io.BytesIO) to export in memory
             include_details: Include detailed justifications sheet
             
         Returns:
-            Path to created Excel file
+            Path to created Excel file, or the file-like object
+        """
+        if hasattr(output_path, "write"):
+            target = output_path
+        else:
+            target = Path(output_path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+        
+        # pyexcelerate holds every sheet in memory until save; very large
+        # detail tables go through the streaming writer instead
+        streaming = include_details and len(analysis.get("fields", [])) > self.STREAMING_FIELD_THRESHOLD
+        
+        if self.engine == "pyexcelerate" and not streaming:
+            self._write_pyexcelerate(analysis, target, include_details)
+        elif self.engine == "xlsxwriter":
+            self._write_xlsxwriter(analysis, target, include_details)
+        else:
+            self._write_openpyxl(analysis, target, include_details)
+        
+        return target if hasattr(target, "write") else str(target)
+    
+    def _write_pyexcelerate(self,
+                            analysis: Dict,
+                            output: Union[Path, BinaryIO],
+                            include_details: bool) -> None:
+        """
+        Write the workbook with pyexcelerate, one data block per sheet.
+        
+        Args:
+            analysis: Analysis dictionary
+            output: Output path or binary file-like object
+            include_details: Include detailed justifications sheet
+        """
+        wb = pyexcelerate.Workbook()
+        
+        # Shared styles
+        header_style = pyexcelerate.Style(
+            font=pyexcelerate.Font(bold=True, color=pyexcelerate.Color(0xFF, 0xFF, 0xFF)),
+            fill=pyexcelerate.Fill(background=pyexcelerate.Color(0x44, 0x72, 0xC4)),
+            alignment=pyexcelerate.Alignment(horizontal="center", vertical="center")
+        )
+        number_style = pyexcelerate.Style(
+            format=pyexcelerate.Format("#,##0"),
+            alignment=pyexcelerate.Alignment(horizontal="right")
+        )
+        
+        # Sheet 1: Template values
+        df_template = self.create_dataframe_from_analysis(analysis)
+        header = [df_template.index.name] + list(df_template.columns)
+        data = [header] + [
+            [row_code] + values
+            for row_code, values in zip(df_template.index, df_template.values.tolist())
+        ]
+        ws = wb.new_sheet('C01.00_Template', data=data)
+        
+        # pyexcelerate addresses cells from 1
+        for col in range(1, len(header) + 1):
+            ws.set_cell_style(1, col, header_style)
+        for row in range(2, len(data) + 1):
+            for col in range(2, len(header) + 1):
+                ws.set_cell_style(row, col, number_style)
+        
+        # Sheet 2: Detailed breakdown
+        if include_details:
+            df_details = self.create_detailed_table(analysis)
+            
+            columns = list(df_details.columns)
+            rows = df_details.values.tolist()
+            
+            ws = wb.new_sheet('Details', data=([columns] if columns else []) + rows)
+            for col_idx, width in enumerate(self._column_widths(df_details), 1):
+                ws.set_col_style(col_idx, pyexcelerate.Style(size=width))
+        
+        # Sheet 3: Row descriptions
+        wb.new_sheet('Row_Definitions', data=[["Row Code", "Description"]] + [
+            [code, desc] for code, desc in self.C0100_STRUCTURE["rows"].items()
+        ])
+        
+        wb.save(output if hasattr(output, "write") else str(output))
+    
+    def _write_openpyxl(self,
+                        analysis: Dict,
+                        output: Union[Path, BinaryIO],
+                        include_details: bool) -> None:
+        """
+        Write the workbook with openpyxl in write-only mode.
+        
+        Args:
+            analysis: Analysis dictionary
+            output: Output path or binary file-like object
+            include_details: Include detailed justifications sheet
         """
-        output_path = Path(output_path)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Create Excel writer
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            # Sheet 1: Template values
-            df_template = self.create_dataframe_from_analysis(analysis)
-            df_template.to_excel(writer, sheet_name='C01.00_Template')
+        wb = Workbook(write_only=True)
+        
+        # Register each cell style once; cells then reference it by name
+        # instead of resolving font, fill, alignment and format one by one
+        wb.add_named_style(NamedStyle(
+            name="corep_header", font=HEADER_FONT, fill=HEADER_FILL, alignment=HEADER_ALIGNMENT
+        ))
+        wb.add_named_style(NamedStyle(
+            name="corep_number", number_format=NUMBER_FORMAT, alignment=NUMBER_ALIGNMENT
+        ))
+        
+        # Sheet 1: Template values
+        df_template = self.create_dataframe_from_analysis(analysis)
+        ws = wb.create_sheet('C01.00_Template')
+        
+        header = []
+        for value in [df_template.index.name] + list(df_template.columns):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = "corep_header"
+            header.append(cell)
+        ws.append(header)
+        
+        for row_code, values in zip(df_template.index, df_template.values.tolist()):
+            row = [row_code]
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = "corep_number"
+                row.append(cell)
+            ws.append(row)
+        
+        # Sheet 2: Detailed breakdown
+        if include_details:
+            df_details = self.create_detailed_table(analysis)
+            ws = wb.create_sheet('Details')
             
-            # Sheet 2: Detailed breakdown
-            if include_details:
-                df_details = self.create_detailed_table(analysis)
-                df_details.to_excel(writer, sheet_name='Details', index=False)
+            columns = list(df_details.columns)
+            rows = df_details.values.tolist()
             
-            # Sheet 3: Row descriptions
-            row_descriptions = pd.DataFrame([
-                {"Row Code": code, "Description": desc}
-                for code, desc in self.C0100_STRUCTURE["rows"].items()
-            ])
-            row_descriptions.to_excel(writer, sheet_name='Row_Definitions', index=False)
+            # Auto-fit columns (widths must be set before rows are written)
+            for col_idx, width in enumerate(self._column_widths(df_details)):
+                ws.column_dimensions[get_column_letter(col_idx + 1)].width = width
+            
+            if columns:
+                ws.append(columns)
+            for row in rows:
+                ws.append(row)
         
-        # Apply formatting
-        self._format_excel(output_path)
+        # Sheet 3: Row descriptions
+        ws = wb.create_sheet('Row_Definitions')
+        ws.append(["Row Code", "Description"])
+        for code, desc in self.C0100_STRUCTURE["rows"].items():
+            ws.append([code, desc])
         
-        return str(output_path)
+        wb.save(output)
     
-    def _format_excel(self, file_path: Path) -> None:
+    def _write_xlsxwriter(self,
+                          analysis: Dict,
+                          output: Union[Path, BinaryIO],
+                          include_details: bool) -> None:
         """
-        Apply formatting to Excel file.
+        Write the workbook with xlsxwriter in constant-memory mode.
+        
+        Constant-memory mode flushes each row once the next one starts, so
+        every sheet is written strictly top to bottom. File-like outputs are
+        assembled in memory instead.
         
         Args:
-            file_path: Path to Excel file
+            analysis: Analysis dictionary
+            output: Output path or binary file-like object
+            include_details: Include detailed justifications sheet
         """
-        wb = openpyxl.load_workbook(file_path)
+        if hasattr(output, "write"):
+            wb = xlsxwriter.Workbook(output, {'in_memory': True})
+        else:
+            wb = xlsxwriter.Workbook(str(output), {'constant_memory': True})
+        
+        # Shared formats
+        header_format = wb.add_format({
+            'bold': True,
+            'font_color': '#FFFFFF',
+            'bg_color': '#4472C4',
+            'align': 'center',
+            'valign': 'vcenter'
+        })
+        number_format = wb.add_format({'num_format': '#,##0', 'align': 'right'})
         
-        # Format template sheet
-        if 'C01.00_Template' in wb.sheetnames:
-            ws = wb['C01.00_Template']
+        # Sheet 1: Template values
+        df_template = self.create_dataframe_from_analysis(analysis)
+        ws = wb.add_worksheet('C01.00_Template')
+        
+        ws.write_row(0, 0, [df_template.index.name] + list(df_template.columns), header_format)
+        for i, (row_code, values) in enumerate(zip(df_template.index, df_template.values.tolist()), 1):
+            ws.write_string(i, 0, row_code)
+            ws.write_row(i, 1, values, number_format)
+        
+        # Sheet 2: Detailed breakdown
+        if include_details:
+            df_details = self.create_detailed_table(analysis)
+            ws = wb.add_worksheet('Details')
             
-            # Header formatting
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF")
+            columns = list(df_details.columns)
+            rows = df_details.values.tolist()
             
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal="center", vertical="center")
+            for col_idx, width in enumerate(self._column_widths(df_details)):
+                ws.set_column(col_idx, col_idx, width)
             
-            # Number formatting
-            for row in ws.iter_rows(min_row=2):
-                for cell in row:
-                    if cell.column > 1:  # Skip index column
-                        cell.number_format = '#,##0'
-                        cell.alignment = Alignment(horizontal="right")
-        
-        # Format details sheet
-        if 'Details' in wb.sheetnames:
-            ws = wb['Details']
+            if columns:
+                ws.write_row(0, 0, columns)
+            for i, row in enumerate(rows, 1):
+                ws.write_row(i, 0, row)
+        
+        # Sheet 3: Row descriptions
+        ws = wb.add_worksheet('Row_Definitions')
+        ws.write_row(0, 0, ["Row Code", "Description"])
+        for i, (code, desc) in enumerate(self.C0100_STRUCTURE["rows"].items(), 1):
+            ws.write_row(i, 0, [code, desc])
+        
+        wb.close()
+    
+    @staticmethod
+    def _column_widths(df: pd.DataFrame) -> List[float]:
+        """
+        Compute auto-fit column widths, capped at 50 characters.
+        
+        String lengths are measured per column with pandas' vectorized
+        string methods rather than cell by cell.
+        
+        Args:
+            df: Table about to be written (headers are its columns)
             
-            # Auto-fit columns
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        wb.save(file_path)
+        Returns:
+            Width per column
+        """
+        header_lengths = np.array([len(str(column)) for column in df.columns], dtype=np.int64)
+        if df.empty:
+            return np.minimum(header_lengths + 2, 50).tolist()
+        
+        value_lengths = df.astype(str).apply(lambda column: column.str.len().max()).to_numpy(dtype=np.int64)
+        return np.minimum(np.maximum(header_lengths, value_lengths) + 2, 50).tolist()
     
     def create_summary_dataframe(self, analysis: Dict) -> pd.DataFrame:
         """
@@ -215,13 +405,30 @@ class COREPTemplateMapper:
         """
         df = self.create_detailed_table(analysis)
         
-        # Format values with currency
+        # Format values with currency (a bound str.format, no per-row lambda)
         if 'Value' in df.columns:
-            df['Value_Formatted'] = df['Value'].apply(lambda x: f"€{x:,.2f}" if pd.notnull(x) else "")
+            df['Value_Formatted'] = df['Value'].map("€{:,.2f}".format).where(df['Value'].notna(), "")
         
         return df
 
 
+@lru_cache(maxsize=None)
+def get_mapper(template_code: str = "C01.00") -> COREPTemplateMapper:
+    """
+    Return the shared mapper for a template.
+    
+    COREPTemplateMapper only holds its configuration and class-level
+    template maps, so one instance per template can serve every caller.
+    
+    Args:
+        template_code: COREP template code
+        
+    Returns:
+        Shared COREPTemplateMapper
+    """
+    return COREPTemplateMapper(template_code=template_code)
+
+
 def map_to_template(analysis: Dict, output_path: Optional[str] = None) -> pd.DataFrame:
     """
     Convenience function to map analysis to template.
@@ -233,7 +440,7 @@ def map_to_template(analysis: Dict, output_path: Optional[str] = None) -> pd.Dat
     Returns:
         DataFrame
     """
-    mapper = COREPTemplateMapper()
+    mapper = get_mapper()
     
     if output_path:
         mapper.export_to_excel(analysis, output_path)
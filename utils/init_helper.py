@@ -3,10 +3,60 @@ Auto-initialization for Streamlit Cloud deployment.
 Builds FAISS index on first run if not found.
 """
 
+import os
 import streamlit as st
 from pathlib import Path
-import sys
-import subprocess
+
+
+INDEX_PATH = Path("data/index.faiss")
+METADATA_PATHS = [Path("data/metadata.parquet"), Path("data/metadata.pkl")]
+
+
+class _NotReady(Exception):
+    """Raised by the cached checks so that failures are never cached."""
+
+
+# Streamlit reruns the whole script on every interaction; once a check has
+# passed, its result is kept in process memory instead of being re-checked
+@st.cache_resource(show_spinner=False)
+def _index_ready() -> bool:
+    """Check for the FAISS index and metadata files (cached once found)."""
+    if INDEX_PATH.exists() and any(p.exists() for p in METADATA_PATHS):
+        return True
+    raise _NotReady()
+
+
+@st.cache_resource(show_spinner=False)
+def _api_key() -> bool:
+    """Look up the Google API key in the environment or Streamlit secrets (cached once found)."""
+    # Check environment variable
+    api_key = os.getenv("GOOGLE_API_KEY")
+    
+    # Check Streamlit secrets
+    if not api_key:
+        try:
+            api_key = st.secrets.get("GOOGLE_API_KEY")
+        except:
+            pass
+    
+    if not api_key or api_key == "your_google_api_key_here":
+        raise _NotReady()
+    return True
+
+
+def clear_init_cache():
+    """Forget cached check results, e.g. after replacing the index or the key."""
+    _index_ready.clear()
+    _api_key.clear()
+
+
+def _has_pdf(directory: Path) -> bool:
+    """Whether a directory contains a PDF (stops at the first one found)."""
+    try:
+        with os.scandir(directory) as entries:
+            return any(entry.name.endswith(".pdf") for entry in entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
 
 
 def check_and_build_index():
@@ -14,16 +64,17 @@ def check_and_build_index():
     Check if FAISS index exists, build if missing.
     Returns: (success: bool, message: str)
     """
-    index_path = Path("data/index.faiss")
-    metadata_path = Path("data/metadata.pkl")
     input_dir = Path("../Input_files")
     
     # Check if index exists
-    if index_path.exists() and metadata_path.exists():
+    try:
+        _index_ready()
         return True, "Index found"
+    except _NotReady:
+        pass
     
     # Check if input files exist
-    if not input_dir.exists() or not list(input_dir.glob("*.pdf")):
+    if not _has_pdf(input_dir):
         return False, f"""
         **Missing Input Files**
         
@@ -79,19 +130,9 @@ def ensure_api_key():
     Check if Google API key is configured.
     Returns: (configured: bool, message: str)
     """
-    import os
-    
-    # Check environment variable
-    api_key = os.getenv("GOOGLE_API_KEY")
-    
-    # Check Streamlit secrets
-    if not api_key:
-        try:
-            api_key = st.secrets.get("GOOGLE_API_KEY")
-        except:
-            pass
-    
-    if not api_key or api_key == "your_google_api_key_here":
+    try:
+        _api_key()
+    except _NotReady:
         return False, """
         **Google API Key Not Configured**
         
@@ -3,6 +3,8 @@ Validation engine for COREP regulatory reporting.
 Checks data quality, consistency, and regulatory compliance.
 """
 
+import re
+from functools import lru_cache
 from typing import Dict, List, Tuple
 import pandas as pd
 
@@ -10,6 +12,9 @@ import pandas as pd
 class ValidationResult:
     """Container for validation results."""
     
+    # No per-instance __dict__; one result is built per validated analysis
+    __slots__ = ("errors", "warnings", "info")
+    
     def __init__(self):
         self.errors: List[Dict] = []
         self.warnings: List[Dict] = []
@@ -68,10 +73,24 @@ class COREPValidator:
         """Initialize validator."""
         pass
     
+    # Properties every populated field must carry
+    REQUIRED_PROPS = ("row", "column", "value", "item_name", "justification", "source")
+    
+    # Valid C01.00 row (010, 020, ... 190) and column codes
+    VALID_ROWS = frozenset(f"{i:03d}" for i in range(10, 200, 10))
+    VALID_COLUMNS = frozenset(("010", "020", "030"))
+    
+    # Item-name keywords marking a deduction from CET1, matched in one scan
+    DEDUCTION_PATTERN = re.compile(r"deduct|intangible|goodwill", re.IGNORECASE)
+    
     def validate_analysis(self, analysis: Dict) -> ValidationResult:
         """
         Run all validation checks on analysis result.
         
+        Document-level checks run first; every per-field rule then runs in
+        a single pass over the fields, and the totals check works from the
+        values collected on the way.
+        
         Args:
             analysis: Analysis dictionary from LLM
             
@@ -79,19 +98,20 @@ class COREPValidator:
             ValidationResult object
         """
         result = ValidationResult()
+        fields = analysis.get("fields") or []
         
-        # Run all validation checks
-        self._check_required_fields(analysis, result)
-        self._check_numeric_values(analysis, result)
-        self._check_row_column_codes(analysis, result)
-        self._check_deductions(analysis, result)
-        self._check_totals(analysis, result)
-        self._check_source_citations(analysis, result)
+        self._check_required_fields(analysis, fields, result)
+        
+        main_column_values = {}
+        for idx, field in enumerate(fields):
+            self._check_field(idx, field, result, main_column_values)
+        
+        self._check_totals(main_column_values, result)
         
         return result
     
-    def _check_required_fields(self, analysis: Dict, result: ValidationResult):
-        """Check that all required fields are present."""
+    def _check_required_fields(self, analysis: Dict, fields: List[Dict], result: ValidationResult):
+        """Check that the analysis has a template and a non-empty fields array."""
         if "template" not in analysis:
             result.add_error(
                 "REQUIRED_FIELDS",
@@ -105,118 +125,120 @@ class COREPValidator:
             )
             return
         
-        if not analysis["fields"]:
+        if not fields:
             result.add_warning(
                 "REQUIRED_FIELDS",
                 "No fields populated in analysis"
             )
-        
-        # Check each field has required properties
-        required_props = ["row", "column", "value", "item_name", "justification", "source"]
-        
-        for idx, field in enumerate(analysis.get("fields", [])):
-            for prop in required_props:
-                if prop not in field:
-                    result.add_error(
-                        "REQUIRED_FIELDS",
-                        f"Field {idx} missing required property: {prop}",
-                        {"field_index": idx, "field": field}
-                    )
     
-    def _check_numeric_values(self, analysis: Dict, result: ValidationResult):
-        """Check that all values are numeric."""
-        for idx, field in enumerate(analysis.get("fields", [])):
-            value = field.get("value")
-            
-            if value is None:
-                result.add_error(
-                    "NUMERIC_VALUES",
-                    f"Field {idx} has null value",
-                    {"field": field}
-                )
-            elif not isinstance(value, (int, float)):
+    def _check_field(self,
+                     idx: int,
+                     field: Dict,
+                     result: ValidationResult,
+                     main_column_values: Dict):
+        """
+        Run every per-field rule on one field.
+        
+        Args:
+            idx: Field position in the analysis
+            field: Field dictionary
+            result: Result to add messages to
+            main_column_values: Row code -> value for column 010, filled in
+                for the totals check
+        """
+        # Required properties
+        for prop in self.REQUIRED_PROPS:
+            if prop not in field:
                 result.add_error(
-                    "NUMERIC_VALUES",
-                    f"Field {idx} has non-numeric value: {value}",
-                    {"field": field, "value_type": type(value).__name__}
+                    "REQUIRED_FIELDS",
+                    f"Field {idx} missing required property: {prop}",
+                    {"field_index": idx, "field": field}
                 )
-    
-    def _check_row_column_codes(self, analysis: Dict, result: ValidationResult):
-        """Check that row/column codes are valid strings."""
-        valid_rows = [f"{i:03d}" for i in range(10, 200, 10)]  # 010, 020, etc.
-        valid_columns = ["010", "020", "030"]
         
-        for idx, field in enumerate(analysis.get("fields", [])):
-            row = field.get("row")
-            col = field.get("column")
-            
-            if not isinstance(row, str):
-                result.add_warning(
-                    "ROW_COLUMN_CODES",
-                    f"Field {idx} row code should be string: {row}",
-                    {"field": field}
-                )
-            
-            if not isinstance(col, str):
-                result.add_warning(
-                    "ROW_COLUMN_CODES",
-                    f"Field {idx} column code should be string: {col}",
-                    {"field": field}
-                )
-            
-            # Check format (3 digits)
-            if row and not (isinstance(row, str) and len(row) == 3 and row.isdigit()):
-                result.add_warning(
-                    "ROW_COLUMN_CODES",
-                    f"Field {idx} row code has unexpected format: {row}",
-                    {"field": field}
-                )
-    
-    def _check_deductions(self, analysis: Dict, result: ValidationResult):
-        """Check that deductions are negative or properly marked."""
-        deduction_keywords = ["deduction", "deduct", "intangible", "goodwill"]
+        row = field.get("row")
+        col = field.get("column")
+        value = field.get("value")
+        is_number = isinstance(value, (int, float))
         
-        for idx, field in enumerate(analysis.get("fields", [])):
-            item_name = field.get("item_name", "").lower()
-            value = field.get("value", 0)
-            
-            # Check if this is likely a deduction
-            is_deduction = any(keyword in item_name for keyword in deduction_keywords)
-            
-            if is_deduction and value > 0:
-                result.add_warning(
-                    "DEDUCTIONS",
-                    f"Field {idx} appears to be a deduction but has positive value: {value}",
-                    {"field": field, "suggestion": "Deductions should be negative"}
-                )
-    
-    def _check_totals(self, analysis: Dict, result: ValidationResult):
-        """Check that totals are consistent."""
-        fields = analysis.get("fields", [])
+        # Numeric values
+        if value is None:
+            result.add_error(
+                "NUMERIC_VALUES",
+                f"Field {idx} has null value",
+                {"field": field}
+            )
+        elif not is_number:
+            result.add_error(
+                "NUMERIC_VALUES",
+                f"Field {idx} has non-numeric value: {value}",
+                {"field": field, "value_type": type(value).__name__}
+            )
         
-        if not fields:
-            return
+        # Row/column codes: one set lookup covers type, length and digits
+        if not (isinstance(row, str) and row in self.VALID_ROWS):
+            result.add_warning(
+                "ROW_COLUMN_CODES",
+                f"Field {idx} has unexpected row code: {row!r}",
+                {"field": field}
+            )
         
-        # Extract values by row
-        row_values = {}
-        for field in fields:
-            row = field.get("row")
-            col = field.get("column", "010")  # Default to main column
-            value = field.get("value", 0)
-            
-            if col == "010":  # Only check main column
-                row_values[row] = value
+        if not (isinstance(col, str) and col in self.VALID_COLUMNS):
+            result.add_warning(
+                "ROW_COLUMN_CODES",
+                f"Field {idx} has unexpected column code: {col!r}",
+                {"field": field}
+            )
+        
+        # Deductions should be negative
+        is_deduction = self.DEDUCTION_PATTERN.search(field.get("item_name") or "") is not None
+        
+        if is_deduction and is_number and value > 0:
+            result.add_warning(
+                "DEDUCTIONS",
+                f"Field {idx} appears to be a deduction but has positive value: {value}",
+                {"field": field, "suggestion": "Deductions should be negative"}
+            )
+        
+        # Source citations (a whitespace-only string counts as missing)
+        source = field.get("source") or ""
+        justification = field.get("justification") or ""
         
-        # Check CET1 calculation (simplified)
-        # CET1 = Items before deductions - Deductions
-        cet1_items = []
-        deductions = []
+        if not source.strip():
+            result.add_warning(
+                "SOURCE_CITATIONS",
+                f"Field {idx} missing source citation",
+                {"field": field}
+            )
         
-        for row, value in row_values.items():
-            if value < 0:
-                deductions.append(value)
-            else:
-                cet1_items.append(value)
+        if not justification.strip():
+            result.add_warning(
+                "SOURCE_CITATIONS",
+                f"Field {idx} missing justification",
+                {"field": field}
+            )
+        
+        # Check if source includes page number
+        if source and "page" not in source.lower():
+            result.add_info(
+                "SOURCE_CITATIONS",
+                f"Field {idx} source may be missing page number",
+                {"field": field}
+            )
+        
+        # Collect main-column values for the totals check
+        if field.get("column", "010") == "010" and is_number:
+            main_column_values[row] = value
+    
+    def _check_totals(self, main_column_values: Dict, result: ValidationResult):
+        """
+        Check that totals are consistent.
+        
+        Args:
+            main_column_values: Row code -> value for column 010
+            result: Result to add messages to
+        """
+        # CET1 = Items before deductions - Deductions (simplified)
+        deductions = [value for value in main_column_values.values() if value < 0]
         
         if deductions:
             total_deductions = sum(deductions)
@@ -225,34 +247,20 @@ class COREPValidator:
                 f"Total deductions: {total_deductions:,}",
                 {"deductions": deductions}
             )
+
+
+@lru_cache(maxsize=None)
+def get_validator() -> COREPValidator:
+    """
+    Return the shared validator.
     
-    def _check_source_citations(self, analysis: Dict, result: ValidationResult):
-        """Check that source citations are provided."""
-        for idx, field in enumerate(analysis.get("fields", [])):
-            source = field.get("source", "")
-            justification = field.get("justification", "")
-            
-            if not source or source.strip() == "":
-                result.add_warning(
-                    "SOURCE_CITATIONS",
-                    f"Field {idx} missing source citation",
-                    {"field": field}
-                )
-            
-            if not justification or justification.strip() == "":
-                result.add_warning(
-                    "SOURCE_CITATIONS",
-                    f"Field {idx} missing justification",
-                    {"field": field}
-                )
-            
-            # Check if source includes page number
-            if source and "page" not in source.lower():
-                result.add_info(
-                    "SOURCE_CITATIONS",
-                    f"Field {idx} source may be missing page number",
-                    {"field": field}
-                )
+    COREPValidator keeps no per-call state (each run builds its own
+    ValidationResult), so one instance can serve every caller.
+    
+    Returns:
+        Shared COREPValidator
+    """
+    return COREPValidator()
 
 
 def validate_corep_analysis(analysis: Dict) -> ValidationResult:
@@ -265,8 +273,7 @@ def validate_corep_analysis(analysis: Dict) -> ValidationResult:
     Returns:
         ValidationResult
     """
-    validator = COREPValidator()
-    return validator.validate_analysis(analysis)
+    return get_validator().validate_analysis(analysis)
 
 
 if __name__ == "__main__":